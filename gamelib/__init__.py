@@ -1,2 +1,2 @@
 __author__ = 'jacobsalway'
-__all__ = ['base', 'extended']
\ No newline at end of file
+__all__ = ['base', 'extended', 'ecs']
\ No newline at end of file
@@ -2,6 +2,10 @@ import pygame
 import sys
 import os
 import math
+import collections
+import itertools
+import threading
+from concurrent import futures
 
 pygame.font.init()
 pygame.mixer.init()
@@ -27,7 +31,7 @@ class Colors:
 
 
 class Director:
-    def __init__(self, game_name=None):
+    def __init__(self, game_name=None, dirty_rects=False, unload_idle_after=None, loading_scene=None):
         # Get screen dimensions
         self.screen_width = 800
         self.screen_height = 600
@@ -49,9 +53,39 @@ class Director:
         self.scenes = {}
         self.start_time = pygame.time.get_ticks()
 
+        # Scenes that get built the first time they're loaded
+        self.scene_factories = {}
+
+        # When each scene was last left
+        self.scene_last_used = {}
+
+        # Milliseconds a built scene can sit unused before it's thrown away, None to keep everything
+        self.unload_idle_after = unload_idle_after
+
         # Initialise active scene
         self.active_scene = None
 
+        # Whether scenes that report their changes only get those regions presented
+        self.use_dirty_rects = dirty_rects
+
+        # Worker thread for reading scenes ahead of time
+        self.executor = futures.ThreadPoolExecutor(max_workers=1)
+
+        # Preload futures for each scene that's been prefetched
+        self.prefetching = {}
+
+        # Scene shown while another one loads, None to always load straight away
+        self.loading_scene = loading_scene
+
+        # [scene being loaded, scene to go back to, preload futures] while the loading scene is up
+        self.loading = None
+
+        # The scene drawn last frame, idle scenes still get drawn once before the loop waits on them
+        self.drawn_scene = None
+
+        # Longest frame scenes get told about in seconds, so a long idle wait or a stall doesn't throw things across the level
+        self.max_delta_time = 0.05
+
         # Initialise delta time variables
         self.delta_time = 0
         self.elapsed_time = 0
@@ -60,52 +94,230 @@ class Director:
     def loop(self):
         # Main game loop
         while not self.quit_flag:
-            # Get a 'global' delta time variable for scenes to access
-            self.delta_time = self.clock.tick(60) / 1000
-            self.elapsed_time = pygame.time.get_ticks() - self.start_time
-            self.scene_elapsed_time += self.scene_start_time + self.delta_time * 1000
+            self.run_frame()
+
+        # Drop the preloads that haven't started, nobody needs them anymore
+        # Only the one that's running gets waited on so nothing touches pygame after it quits
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+        # If we break the loop exit the game
+        # So many people without this and I couldn't close their games
+        pygame.quit()
+        sys.exit()
+
+    def run_frame(self):
+        # One pass of the main loop
+        # Idle scenes don't change without input so sleep until some turns up
+        if self.active_scene is self.drawn_scene and self.active_scene.is_idle():
+            events = self.wait_for_events(self.active_scene.get_wakeup_time())
+
+            # However long we slept counts as one frame, no need to hold it to 60 FPS
+            frame_time = self.clock.tick()
+        else:
+            frame_time = self.clock.tick(60)
 
             # Get all pygame events in current frame
             events = pygame.event.get()
 
-            for event in events:
-                # If system quit signal
-                if event.type == pygame.QUIT:
+        # Get a 'global' delta time variable for scenes to access
+        self.delta_time = min(frame_time / 1000, self.max_delta_time)
+
+        # Timers still go by the real time so idle scenes wake up when they asked to
+        self.elapsed_time = pygame.time.get_ticks() - self.start_time
+        self.scene_elapsed_time += self.scene_start_time + frame_time
+
+        for event in events:
+            # If system quit signal
+            if event.type == pygame.QUIT:
+                self.quit()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
                     self.quit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        self.quit()
 
-            # Detect events
-            self.active_scene.on_event(events)
+        # Detect events
+        self.active_scene.on_event(events)
 
-            # Update scene
-            self.active_scene.on_update()
+        # Swap in a scene once it's finished loading
+        self.update_loading()
 
+        # Update scene
+        self.active_scene.on_update()
+
+        # Scenes that report what they changed keep the old frame underneath
+        if self.use_dirty_rects and self.active_scene.uses_dirty_rects:
+            # Draw the screen
+            self.active_scene.on_draw(self.screen)
+
+            # Only push the regions the scene changed
+            self.present(self.active_scene.get_dirty_rects())
+        else:
             # Refill the screen
             self.screen.fill((0, 0, 0))
 
+            # The scene has to draw everything onto the fresh screen
+            self.active_scene.mark_dirty()
+
             # Draw the screen
             self.active_scene.on_draw(self.screen)
 
             # Redraw display
             pygame.display.flip()
 
-        # If we break the loop exit the game
-        # So many people without this and I couldn't close their games
-        pygame.quit()
-        sys.exit()
+            # The whole screen went out so drop whatever regions the scene marked, otherwise they pile up
+            self.active_scene.get_dirty_rects()
+
+        self.drawn_scene = self.active_scene
+
+    def wait_for_events(self, timeout=None):
+        # Block until there's an event, or until the timeout in milliseconds runs out
+        if timeout is None:
+            event = pygame.event.wait()
+        elif timeout > 0:
+            event = pygame.event.wait(max(1, int(timeout)))
+        else:
+            # Already past the wakeup so don't wait at all
+            return pygame.event.get()
+
+        # Timing out hands back a NOEVENT
+        events = [] if event.type == pygame.NOEVENT else [event]
+
+        # Grab anything else that came in with it
+        return events + pygame.event.get()
+
+    def present(self, rects):
+        # None means the whole screen changed
+        if rects is None:
+            pygame.display.flip()
+        # Nothing changed means nothing to push
+        elif len(rects) > 0:
+            pygame.display.update(rects)
 
     def add_scenes(self, scenes):
         # If scenes is a list
         if type(scenes) is list:
             for scene in scenes:
+                # A (name, factory) pair gets built when it's first loaded
+                # The factory gets called with the director
+                if type(scene) is tuple:
+                    self.scene_factories[scene[0]] = scene[1]
+                    continue
+
                 # For each scene pass a director reference
                 scene.director = self
 
                 # Make scenes accessible by name
                 self.scenes[str(scene.name)] = scene
 
+    def get_scene(self, scene_name):
+        # Build the scene if this is the first time we need it
+        if scene_name not in self.scenes:
+            if scene_name not in self.scene_factories:
+                raise Exception('No scene called ' + str(scene_name))
+
+            scene = self.scene_factories[scene_name](self)
+            scene.director = self
+            self.scenes[scene_name] = scene
+
+        return self.scenes[scene_name]
+
+    def prefetch(self, scene_names):
+        # Read the files for scenes we'll probably need soon on the worker thread
+        # Only the display conversion is left for the main thread when the scene gets built
+        for scene_name in scene_names:
+            if scene_name in self.scenes or scene_name in self.prefetching:
+                continue
+
+            factory = self.scene_factories.get(scene_name)
+            if factory is None or not hasattr(factory, 'preload_tasks'):
+                continue
+
+            self.prefetching[scene_name] = [self.executor.submit(task) for task in factory.preload_tasks()]
+
+    def cancel_prefetches(self, keep=None):
+        # Drop the queued preloads for every scene except keep
+        for scene_name, tasks in list(self.prefetching.items()):
+            if scene_name == keep:
+                continue
+
+            # Anything running or finished can't be cancelled, it still warms the caches
+            cancelled = [task.cancel() for task in tasks]
+
+            # It'll need prefetching again
+            if any(cancelled):
+                del self.prefetching[scene_name]
+
+    def load_scene_async(self, scene_name):
+        # Built scenes don't need a loading screen
+        if self.loading_scene is None or scene_name in self.scenes:
+            self.load_scene(scene_name)
+            return
+
+        self.prefetch([scene_name])
+        tasks = self.prefetching.get(scene_name, [])
+
+        # Already prefetched so there's nothing to wait for
+        if all(task.done() for task in tasks):
+            self.load_scene(scene_name)
+            return
+
+        # The worker goes in order so don't make this one wait behind scenes nobody picked
+        self.cancel_prefetches(keep=scene_name)
+
+        previous_scene = self.active_scene.name if self.active_scene is not None else None
+        self.loading = [scene_name, previous_scene, tasks]
+
+        # The loop keeps running while the worker reads the files
+        self.load_scene(self.loading_scene)
+
+    def loading_progress(self):
+        # Fraction of the preload tasks that are finished
+        if self.loading is None or len(self.loading[2]) == 0:
+            return 1
+
+        return sum(task.done() for task in self.loading[2]) / len(self.loading[2])
+
+    def update_loading(self):
+        if self.loading is None or self.loading_progress() < 1:
+            return
+
+        scene_name = self.loading[0]
+        self.loading = None
+
+        # Building and converting surfaces has to happen on this thread
+        self.load_scene(scene_name)
+
+    def cancel_loading(self):
+        if self.loading is None:
+            return
+
+        scene_name, previous_scene, tasks = self.loading
+        self.loading = None
+
+        # Tasks that haven't started get dropped, whatever finished stays cached
+        for task in tasks:
+            task.cancel()
+
+        self.prefetching.pop(scene_name, None)
+
+        if previous_scene is not None:
+            self.load_scene(previous_scene)
+
+    def unload_idle_scenes(self):
+        if self.unload_idle_after is None:
+            return
+
+        now = pygame.time.get_ticks()
+
+        # Only scenes with a factory can be thrown away because we can build them again
+        for scene_name, last_used in list(self.scene_last_used.items()):
+            if scene_name in self.scene_factories and scene_name in self.scenes and now - last_used > self.unload_idle_after:
+                if self.scenes[scene_name] is not self.active_scene:
+                    del self.scenes[scene_name]
+                    del self.scene_last_used[scene_name]
+
+                    # It'll need prefetching again
+                    self.prefetching.pop(scene_name, None)
+
     def load_scene(self, scene_name):
         # Fill screen with black to clear all previous outputs
         self.screen.fill(Colors.BLACK)
@@ -113,12 +325,21 @@ class Director:
         if self.active_scene is not None:
             self.active_scene.on_exit()
 
+            # Remember when we left it
+            self.scene_last_used[self.active_scene.name] = pygame.time.get_ticks()
+
         # Set the active scene for the main game loop
-        self.active_scene = self.scenes[scene_name]
+        self.active_scene = self.get_scene(scene_name)
+
+        # Throw away anything that's been sitting around too long
+        self.unload_idle_scenes()
 
         # Pass a director reference to the scene
         self.active_scene.director = self
 
+        # The screen was just cleared so the scene has to draw everything
+        self.active_scene.mark_dirty()
+
         # Call the on_reload for the scene
         self.active_scene.on_load()
 
@@ -126,6 +347,12 @@ class Director:
         self.scene_start_time = 0
         self.scene_elapsed_time = 0
 
+        # The new scene gets updated this frame too, don't hand it however long the last scene sat there
+        self.delta_time = min(self.delta_time, 1 / 60)
+
+        # And building it doesn't count towards its first frame
+        self.clock.tick()
+
     def quit(self):
         # Break the loop so the game ends
         self.quit_flag = True
@@ -135,6 +362,10 @@ class Director:
         if type(command) is list:
             if command[0] == 'load_scene':
                 self.load_scene(command[1])
+            elif command[0] == 'load_scene_async':
+                self.load_scene_async(command[1])
+            elif command[0] == 'cancel_loading':
+                self.cancel_loading()
             elif command[0] == 'quit':
                 self.quit()
 
@@ -145,6 +376,9 @@ class Director:
 
 
 class Scene:
+    # Scenes that report the regions they change set this to True
+    uses_dirty_rects = False
+
     def __init__(self, director=None, name=None):
         # Set director reference
         if director is not None:
@@ -153,6 +387,12 @@ class Scene:
         if name is not None and type(name) is str:
             self.name = name
 
+        # Regions changed since the last present
+        self.dirty_rects = []
+
+        # Whether the whole screen has to be drawn and presented
+        self.full_redraw = True
+
     def on_event(self, event):
         # Pass events to scene for processing
         raise NotImplementedError('on_event not defined in subclass!')
@@ -165,6 +405,20 @@ class Scene:
         # Draw surfaces within scene
         raise NotImplementedError('on_draw not defined in subclass!')
 
+    @classmethod
+    def preload_tasks(cls):
+        # Functions the director can run on a worker thread before the scene gets built
+        # They should only warm caches, no display surfaces or scene state
+        return []
+
+    def is_idle(self):
+        # Idle scenes only change on input, so the director waits for events instead of running frames
+        return False
+
+    def get_wakeup_time(self):
+        # Milliseconds an idle scene can go without events before it needs a frame, None to wait forever
+        return None
+
     def on_load(self):
         # Called when the scene is loaded
         pass
@@ -173,6 +427,26 @@ class Scene:
         # Called when the scene is exited
         pass
 
+    def mark_dirty(self, rect=None):
+        # No rect means the whole screen changed
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def get_dirty_rects(self):
+        # None tells the director to present the whole screen
+        if self.full_redraw:
+            rects = None
+        else:
+            rects = self.dirty_rects
+
+        # Start fresh for the next frame
+        self.dirty_rects = []
+        self.full_redraw = False
+
+        return rects
+
 
 # /===================================/
 #  Base GUI Class
@@ -232,8 +506,8 @@ class Text(GUIElement):
         w = self.rect.width
         h = self.rect.height
 
-        # Render font
-        rendered_text = self._font.render(self._caption, True, self.font_color)
+        # Render font, strings we've seen before come from the cache
+        rendered_text = render_text(self._font, self._caption, self.font_color)
         caption_rect = rendered_text.get_rect()
 
         # Center text
@@ -323,7 +597,7 @@ class Button(GUIElement):
         self.highlight_surface.fill(self._bgcolor)
 
         # Draw the caption text
-        rendered_text = self._font.render(self._caption, True, self.font_color)
+        rendered_text = render_text(self._font, self._caption, self.font_color)
         caption_rect = rendered_text.get_rect()
         caption_rect.center = int(w / 2), int(h / 2)
         self.normal_surface.blit(rendered_text, caption_rect)
@@ -342,17 +616,20 @@ class Button(GUIElement):
 
         has_exited = False
 
+        # Only need to check once
+        mouse_over = self.rect.collidepoint(event_object.pos)
+
         # If mouse not over button previously but over button now
-        if not self.mouse_over_button and self.rect.collidepoint(event_object.pos):
+        if not self.mouse_over_button and mouse_over:
             # Mouse has entered the button
             self.mouse_over_button = True
             self.mouse_enter(event_object)
         # If mouse over button previously but no over button now
-        elif self.mouse_over_button and not self.rect.collidepoint(event_object.pos):
+        elif self.mouse_over_button and not mouse_over:
             self.mouse_over_button = False
             has_exited = True
 
-        if self.rect.collidepoint(event_object.pos):
+        if mouse_over:
             if event_object.type == pygame.MOUSEMOTION:
                 self.mouse_move(event_object)
             elif event_object.type == pygame.MOUSEBUTTONDOWN:
@@ -399,6 +676,81 @@ class Button(GUIElement):
         raise NotImplementedError('mouse_up not defined in subclass')
 
 
+# /===================================/
+#  GUI dispatcher class
+#  Hands mouse events to just the elements they matter to instead of every element
+#  Elements go in a spatial grid so finding what's under the cursor doesn't mean checking everything
+# /===================================/
+
+
+class GUIDispatcher:
+    def __init__(self, elements=None, cell_size=64):
+        self.grid = SpatialGrid(cell_size)
+
+        # Elements under the cursor as of the last event
+        self.hovered = []
+
+        # Elements that are pressed down, they need to hear about the button coming up wherever it happens
+        self.pressed = []
+
+        if elements is not None:
+            for element in elements:
+                self.add(element)
+
+    def add(self, element):
+        self.grid.insert(element)
+
+    def remove(self, element):
+        self.grid.remove(element)
+
+        if element in self.hovered:
+            self.hovered.remove(element)
+        if element in self.pressed:
+            self.pressed.remove(element)
+
+    def update(self, element):
+        # Call this after an element moves or changes size
+        self.grid.update(element)
+
+    def get_elements_at(self, position):
+        return self.grid.query(pygame.Rect(position, (1, 1)))
+
+    def coalesce(self, events):
+        # Motion events in a row only matter for where the mouse ended up
+        # Clicks in between are kept in order so they still happen where they happened
+        mouse_events = []
+
+        for event in events:
+            if event.type not in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                continue
+
+            if event.type == pygame.MOUSEMOTION and len(mouse_events) > 0 and mouse_events[-1].type == pygame.MOUSEMOTION:
+                mouse_events[-1] = event
+            else:
+                mouse_events.append(event)
+
+        return mouse_events
+
+    def dispatch(self, events):
+        for event in self.coalesce(events):
+            under_cursor = self.get_elements_at(event.pos)
+
+            # Whatever's under the cursor, whatever it just left and whatever's held down
+            targets = list(under_cursor)
+            for element in self.hovered + self.pressed:
+                if element not in targets:
+                    targets.append(element)
+
+            # Same order as they were added so overlapping elements act like they used to
+            targets.sort(key=lambda element: self.grid.entries[element][1])
+
+            for element in targets:
+                element.handle_event(event)
+
+            self.hovered = under_cursor
+            self.pressed = [element for element in targets if getattr(element, 'button_toggled', False) or getattr(element, 'last_button_toggled', False)]
+
+
 # /===================================/
 #  General image class
 # /===================================/
@@ -411,11 +763,18 @@ class Image(GUIElement):
         if image is None:
             self._source_image = pygame.Surface((100, 100))
         else:
-            self._source_image = pygame.image.load(os.path.join(*image)).convert()
+            self._source_image = ASSET_CACHE.load_image(image)
+
+        # Keep the file reference so subclasses can get scaled copies from the cache
+        self._image_file = image
 
-        self.surface = pygame.Surface(self.rect.size)
+        # Subclasses can set up their own surface in _update
+        self.surface = None
         self._update()
 
+        if self.surface is None:
+            self.surface = pygame.Surface(self.rect.size)
+
     def draw(self, screen):
         screen.blit(self.surface, self.rect, (0, 0, self.rect.width, self.rect.height))
 
@@ -426,17 +785,25 @@ class Image(GUIElement):
         pass
 
 
+# Every game object gets the next number
+OBJECT_IDS = itertools.count(1)
+
+
 # /===================================/
 #  Base game object class
 # /===================================/
 
 
 class GameObject:
+    # Slots keep thousands of tiles small
+    # Subclasses that don't declare their own slots get a normal __dict__ so they can add whatever they like
+    __slots__ = ('scene', 'x', 'y', 'id')
+
     def __init__(self, scene=None, x=0, y=0):
         self.scene = scene
         self.x = x
         self.y = y
-        self.id = os.urandom(8)
+        self.id = next(OBJECT_IDS)
 
     def on_start(self):
         pass
@@ -456,6 +823,14 @@ class Camera:
         # Return the changed rectangle based on the camera offset
         return target.rect.move(self.state.topleft)
 
+    def to_world(self, position):
+        # The other way, from a point on screen to where it is in the level
+        return position[0] - self.state.x, position[1] - self.state.y
+
+    def view_rect(self, margin=0):
+        # The part of the level the screen is looking at, in level coordinates
+        return pygame.Rect(-self.state.x - margin, -self.state.y - margin, self.scene.director.screen_width + margin * 2, self.scene.director.screen_height + margin * 2)
+
     def update(self, target):
         # Update the offset based on the position of the active object
         self.state = self.complex_camera(self.state, target.rect)
@@ -479,6 +854,338 @@ class Camera:
         return pygame.Rect(l, t, w, h)
 
 
+# /===================================/
+#  Spatial grid class
+#  Buckets objects with a rect into fixed size cells
+#  So finding what's in an area doesn't mean checking everything
+# /===================================/
+
+
+class SpatialGrid:
+    def __init__(self, cell_size=32):
+        # Size of each cell in pixels
+        self.cell_size = cell_size
+
+        # The objects in each cell, keyed by cell coordinates
+        self.cells = {}
+
+        # The cells each object covers and the order it was added in
+        self.entries = {}
+        self._added = 0
+
+    def get_cell_range(self, rect):
+        # The first and last cell the rect touches on each axis
+        size = self.cell_size
+        return rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size
+
+    def _add_cells(self, grid_object, cell_range):
+        for x in range(cell_range[0], cell_range[2] + 1):
+            for y in range(cell_range[1], cell_range[3] + 1):
+                self.cells.setdefault((x, y), set()).add(grid_object)
+
+    def _remove_cells(self, grid_object, cell_range):
+        for x in range(cell_range[0], cell_range[2] + 1):
+            for y in range(cell_range[1], cell_range[3] + 1):
+                cell = self.cells.get((x, y))
+                if cell is not None:
+                    cell.discard(grid_object)
+
+                    # Don't keep empty cells around
+                    if len(cell) == 0:
+                        del self.cells[(x, y)]
+
+    def insert(self, grid_object):
+        # Already in here so just make sure it's in the right cells
+        if grid_object in self.entries:
+            self.update(grid_object)
+            return
+
+        cell_range = self.get_cell_range(grid_object.rect)
+        self.entries[grid_object] = [cell_range, self._added]
+        self._added += 1
+
+        self._add_cells(grid_object, cell_range)
+
+    def remove(self, grid_object):
+        entry = self.entries.pop(grid_object, None)
+
+        if entry is not None:
+            self._remove_cells(grid_object, entry[0])
+
+    def update(self, grid_object):
+        # Call this after an object moves
+        entry = self.entries.get(grid_object)
+
+        if entry is None:
+            return
+
+        # Only touch the cells if it actually crossed into different ones
+        cell_range = self.get_cell_range(grid_object.rect)
+        if cell_range != entry[0]:
+            self._remove_cells(grid_object, entry[0])
+            self._add_cells(grid_object, cell_range)
+            entry[0] = cell_range
+
+    def query(self, rect):
+        x_start, y_start, x_end, y_end = self.get_cell_range(rect)
+
+        # Huge rects cover more cells than there are objects so just check them all
+        if (x_end - x_start + 1) * (y_end - y_start + 1) > len(self.entries):
+            found = self.entries.keys()
+        else:
+            # Everything in the cells the rect touches
+            found = set()
+            for x in range(x_start, x_end + 1):
+                for y in range(y_start, y_end + 1):
+                    cell = self.cells.get((x, y))
+                    if cell is not None:
+                        found.update(cell)
+
+        # Keep the order things were added in so drawing and collisions stay the same
+        return sorted([grid_object for grid_object in found if grid_object.rect.colliderect(rect)], key=lambda grid_object: self.entries[grid_object][1])
+
+    def __contains__(self, grid_object):
+        return grid_object in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# /===================================/
+#  Glyph atlas class
+#  Renders each character of a font once into one surface
+#  Strings get put together by blitting the characters out of it, no font rendering needed
+#  Good for numbers that change all the time like timers
+# /===================================/
+
+
+class GlyphAtlas:
+    def __init__(self, font, color, characters='0123456789', antialias=True):
+        # Where each character is in the atlas surface
+        self.glyphs = {}
+
+        rendered_glyphs = [(character, font.render(character, antialias, color)) for character in characters]
+
+        self.height = max([glyph.get_height() for character, glyph in rendered_glyphs] + [font.get_height()])
+        self.surface = pygame.Surface((max(1, sum(glyph.get_width() for character, glyph in rendered_glyphs)), self.height), pygame.SRCALPHA)
+
+        # Side by side, copied straight in so the edges don't get blended twice
+        x = 0
+        for character, glyph in rendered_glyphs:
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.glyphs[character] = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            x += glyph.get_width()
+
+    def can_render(self, text):
+        return all(character in self.glyphs for character in text)
+
+    def size(self, text):
+        return sum(self.glyphs[character].width for character in text), self.height
+
+    def draw(self, screen, text, position):
+        # One blits call for the whole string
+        x, y = position
+        blit_list = []
+
+        for character in text:
+            area = self.glyphs[character]
+            blit_list.append((self.surface, (x, y), area))
+            x += area.width
+
+        screen.blits(blit_list, False)
+
+
+# Atlases get shared between everything using the same font, color and characters
+GLYPH_ATLASES = {}
+
+
+def get_glyph_atlas(font, color, characters='0123456789', antialias=True):
+    key = (font, tuple(color), characters, antialias)
+
+    if key not in GLYPH_ATLASES:
+        GLYPH_ATLASES[key] = GlyphAtlas(font, color, characters, antialias)
+
+    return GLYPH_ATLASES[key]
+
+
+# /===================================/
+#  LRU cache class
+#  Forgets whatever was used least recently once it gets too big
+# /===================================/
+
+
+class LRUCache:
+    def __init__(self, max_size, get_size=None):
+        # How big the cache can get before it starts forgetting things
+        self.max_size = max_size
+
+        # How much each value counts towards the size, one per value by default
+        if get_size is None:
+            self.get_size = lambda value: 1
+        else:
+            self.get_size = get_size
+
+        # Oldest first
+        self.entries = collections.OrderedDict()
+        self.sizes = {}
+        self.size = 0
+
+        # Preloads fill caches from the worker thread
+        self.lock = threading.RLock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+
+            # It's the most recently used now
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            # Replace anything already there
+            self.discard(key)
+
+            self.entries[key] = value
+            self.sizes[key] = self.get_size(value)
+            self.size += self.sizes[key]
+
+            self.evict()
+
+    def discard(self, key):
+        with self.lock:
+            if key in self.entries:
+                del self.entries[key]
+                self.size -= self.sizes.pop(key)
+
+    def set_max_size(self, max_size):
+        with self.lock:
+            self.max_size = max_size
+            self.evict()
+
+    def evict(self):
+        with self.lock:
+            # Forget the least recently used values until we fit
+            # The newest value always stays even if it's too big on its own
+            while self.size > self.max_size and len(self.entries) > 1:
+                key, value = self.entries.popitem(last=False)
+                self.size -= self.sizes.pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.size = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+# /===================================/
+#  Asset cache class
+#  Images get loaded from disk once and shared between everything that uses them
+#  Keyed by file and transform so scaled copies are shared too
+#  Don't draw on surfaces from here, copy them first
+#  Files can be preloaded on another thread, they get converted the first time they're loaded
+# /===================================/
+
+
+class AssetCache(LRUCache):
+    def __init__(self, budget=48 * 1024 * 1024):
+        # The budget is in bytes of pixel and sample data
+        super().__init__(budget, get_asset_bytes)
+
+    def preload_image(self, file_location):
+        # Decode without converting, converting needs the display so it waits for the main thread
+        key = (os.path.join(*file_location), 'raw')
+
+        if key not in self and (key[0], None, False, None) not in self and (key[0], None, True, None) not in self:
+            self.put(key, pygame.image.load(key[0]))
+
+    def preload_sound(self, file_location):
+        # Decode the samples so the sound can be made straight from the buffer
+        key = (os.path.join(*file_location), 'sound')
+
+        if key not in self:
+            self.put(key, pygame.mixer.Sound(key[0]).get_raw())
+
+    def load_sound(self, file_location):
+        # Samples from a preload, or None if it hasn't been preloaded
+        # They're only kept until the sound gets made since music is big
+        key = (os.path.join(*file_location), 'sound')
+
+        with self.lock:
+            samples = self.get(key)
+            self.discard(key)
+
+        return samples
+
+    def load_image(self, file_location, size=None, alpha=False, colorkey=None):
+        key = (os.path.join(*file_location), size, alpha, colorkey)
+
+        surface = self.get(key)
+        if surface is not None:
+            return surface
+
+        if size is None and colorkey is None:
+            # Use the preloaded copy or go straight to the disk
+            surface = self.get((key[0], 'raw'))
+            if surface is None:
+                surface = pygame.image.load(key[0])
+            else:
+                self.discard((key[0], 'raw'))
+
+            surface = surface.convert_alpha() if alpha else surface.convert()
+        else:
+            # Build it from the plain copy so the file only gets read once
+            surface = self.load_image(file_location, None, alpha)
+
+            if size is not None:
+                surface = pygame.transform.scale(surface, size)
+                surface = surface.convert_alpha() if alpha else surface.convert()
+            else:
+                surface = surface.copy()
+
+            if colorkey is not None:
+                surface.set_colorkey(colorkey, pygame.RLEACCEL)
+
+        self.put(key, surface)
+
+        return surface
+
+    def set_budget(self, budget):
+        self.set_max_size(budget)
+
+
+# Render text through the shared cache, keyed by font, text, color and antialiasing
+# Don't draw on surfaces from here either
+def render_text(font, text, color, antialias=True):
+    key = (font, text, tuple(color), antialias)
+
+    rendered_text = TEXT_CACHE.get(key)
+    if rendered_text is None:
+        rendered_text = font.render(text, antialias, color)
+        TEXT_CACHE.put(key, rendered_text)
+
+    return rendered_text
+
+
+# How many bytes of pixel data a surface holds
+def get_surface_bytes(surface):
+    return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+
+# How many bytes a cached asset holds, sounds are kept as raw bytes
+def get_asset_bytes(asset):
+    if type(asset) is bytes:
+        return len(asset)
+    return get_surface_bytes(asset)
+
+
 # /===================================/
 #  Image surface class
 # /===================================/
@@ -486,13 +1193,11 @@ class Camera:
 
 class ImageSurface(pygame.Surface):
     def __init__(self, file_location, transform=None):
-        # Get the image file
-        source_image = pygame.image.load(os.path.join(*file_location)).convert()
-
-        # If there is a transform
+        # Get the image file, transformed if there is a transform
         if type(transform) is tuple:
-            # Transform the image
-            source_image = pygame.transform.scale(source_image, transform).convert()
+            source_image = ASSET_CACHE.load_image(file_location, transform)
+        else:
+            source_image = ASSET_CACHE.load_image(file_location)
 
         super().__init__((source_image.get_rect().width, source_image.get_rect().height), 0, source_image)
 
@@ -545,3 +1250,10 @@ def middle_value(lower_bound, value, upper_bound):
     elif value > upper_bound:
         return upper_bound
     return value
+
+
+# Shared by everything that loads images
+ASSET_CACHE = AssetCache()
+
+# Shared by all the text
+TEXT_CACHE = LRUCache(4 * 1024 * 1024, get_surface_bytes)
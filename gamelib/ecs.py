@@ -0,0 +1,398 @@
+import pygame
+import array
+import itertools
+from . import extended
+
+# NumPy is only needed to work on whole columns at once
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# /===================================/
+#  Entity component system
+#  An optional way to hold loads of entities without an object for each one
+#  Entities are just numbers, their components live in columns grouped by archetype
+#  Every entity with exactly the same components shares an archetype, so systems walk straight down the columns
+# /===================================/
+
+
+# The fields of each component and the array typecode they're stored with
+# None means a plain list, for things like surfaces
+# Any other component name is a tag, it has no fields and just says what the entity is
+COMPONENTS = {
+    'position': (('x', 'q'), ('y', 'q')),
+    'velocity': (('delta_x', 'd'), ('delta_y', 'd')),
+    'collider': (('width', 'q'), ('height', 'q')),
+    'sprite': (('surface', None),),
+    'layer': (('layer', 'q'),)
+}
+
+
+# /===================================/
+#  Archetype class
+#  The columns for every entity with one set of components
+# /===================================/
+
+
+class Archetype:
+    def __init__(self, components, schema):
+        self.components = frozenset(components)
+
+        # The entity in each row
+        self.entities = array.array('q')
+
+        # One column per field, all the same length as entities
+        self.columns = {}
+        for component in sorted(self.components):
+            for field, typecode in schema.get(component, ()):
+                self.columns[field] = array.array(typecode) if typecode is not None else []
+
+    def add(self, entity, values):
+        # Values is field to value, returns the new row
+        self.entities.append(entity)
+
+        for field, column in self.columns.items():
+            column.append(values[field])
+
+        return len(self.entities) - 1
+
+    def remove(self, row):
+        # Move the last row into the gap so nothing has to shift
+        # Returns the entity that moved into the row, or None if it was the last one
+        last = len(self.entities) - 1
+        moved_entity = None
+
+        if row != last:
+            moved_entity = self.entities[last]
+            self.entities[row] = moved_entity
+
+            for column in self.columns.values():
+                column[row] = column[last]
+
+        self.entities.pop()
+        for column in self.columns.values():
+            column.pop()
+
+        return moved_entity
+
+    def get_values(self, row):
+        return {field: column[row] for field, column in self.columns.items()}
+
+    def view(self, field):
+        # A numpy array over the column without copying it, or the column itself without numpy
+        # Don't add or remove entities while holding onto a view, the column can't grow while it's shared
+        column = self.columns[field]
+
+        if numpy is None or type(column) is list:
+            return column
+
+        return numpy.frombuffer(column, dtype=column.typecode)
+
+    def __len__(self):
+        return len(self.entities)
+
+
+# /===================================/
+#  World class
+#  Holds every entity and hands out archetypes to systems
+# /===================================/
+
+
+class World:
+    def __init__(self):
+        self.schema = dict(COMPONENTS)
+
+        # Archetypes by their set of components
+        self.archetypes = {}
+
+        # The archetype and row of each entity
+        self.locations = {}
+
+        self.entity_ids = itertools.count(1)
+
+    def register_component(self, name, fields):
+        # Fields are (name, typecode) pairs, field names can't clash with other components
+        for field, typecode in fields:
+            for component, component_fields in self.schema.items():
+                if component != name and field in [existing_field for existing_field, existing_typecode in component_fields]:
+                    raise Exception('Field ' + field + ' is already used by ' + component)
+
+        if any(name in archetype.components for archetype in self.archetypes.values()):
+            raise Exception('Component ' + name + ' is already in use')
+
+        self.schema[name] = tuple(fields)
+
+    def get_archetype(self, components):
+        key = frozenset(components)
+
+        if key not in self.archetypes:
+            self.archetypes[key] = Archetype(key, self.schema)
+
+        return self.archetypes[key]
+
+    def get_fields(self, component):
+        return [field for field, typecode in self.schema.get(component, ())]
+
+    def create(self, components):
+        # Components is component name to a tuple of its field values, tags get an empty tuple
+        values = {}
+        for component, component_values in components.items():
+            values.update(zip(self.get_fields(component), component_values))
+
+        archetype = self.get_archetype(components.keys())
+        entity = next(self.entity_ids)
+
+        self.locations[entity] = [archetype, archetype.add(entity, values)]
+
+        return entity
+
+    def destroy(self, entity):
+        archetype, row = self.locations.pop(entity)
+
+        moved_entity = archetype.remove(row)
+        if moved_entity is not None:
+            self.locations[moved_entity][1] = row
+
+    def has(self, entity, component):
+        return component in self.locations[entity][0].components
+
+    def get(self, entity, component):
+        archetype, row = self.locations[entity]
+        return tuple(archetype.columns[field][row] for field in self.get_fields(component))
+
+    def set(self, entity, component, component_values):
+        archetype, row = self.locations[entity]
+
+        for field, value in zip(self.get_fields(component), component_values):
+            archetype.columns[field][row] = value
+
+    def add_components(self, entity, components):
+        # Moves the entity to the archetype with the extra components
+        archetype, row = self.locations[entity]
+
+        values = archetype.get_values(row)
+        for component, component_values in components.items():
+            values.update(zip(self.get_fields(component), component_values))
+
+        self._move(entity, archetype.components | set(components.keys()), values)
+
+    def remove_components(self, entity, components):
+        archetype, row = self.locations[entity]
+        self._move(entity, archetype.components - set(components), archetype.get_values(row))
+
+    def _move(self, entity, components, values):
+        archetype, row = self.locations[entity]
+
+        moved_entity = archetype.remove(row)
+        if moved_entity is not None:
+            self.locations[moved_entity][1] = row
+
+        new_archetype = self.get_archetype(components)
+        self.locations[entity] = [new_archetype, new_archetype.add(entity, values)]
+
+    def query(self, components, excluded=()):
+        # Every archetype with all the components and none of the excluded ones that has something in it
+        components = frozenset(components)
+        return [archetype for key, archetype in self.archetypes.items() if components <= key and key.isdisjoint(excluded) and len(archetype) > 0]
+
+    def __contains__(self, entity):
+        return entity in self.locations
+
+    def __len__(self):
+        return len(self.locations)
+
+
+# /===================================/
+#  System classes
+#  Each one runs over every archetype with its components in one go
+# /===================================/
+
+
+class System:
+    # What an entity needs for the system to run on it
+    components = ()
+
+    # What an entity can't have for the system to run on it
+    excluded = ()
+
+    def update(self, world, delta_time):
+        for archetype in world.query(self.components, self.excluded):
+            self.process(archetype, delta_time)
+
+    def process(self, archetype, delta_time):
+        raise NotImplementedError('process not defined in subclass!')
+
+
+class GravitySystem(System):
+    # Only entities tagged with gravity fall
+    components = ('velocity', 'gravity')
+
+    def __init__(self, gravity=25, max_fall=15):
+        self.gravity = gravity
+        self.max_fall = max_fall
+
+    def process(self, archetype, delta_time):
+        delta_y = archetype.view('delta_y')
+
+        if numpy is not None:
+            delta_y += self.gravity * delta_time
+            numpy.minimum(delta_y, self.max_fall, out=delta_y)
+        else:
+            for row in range(len(delta_y)):
+                delta_y[row] = min(self.max_fall, delta_y[row] + self.gravity * delta_time)
+
+
+class MovementSystem(System):
+    # Velocities are already in pixels for this frame like the rest of the game
+    # Anything with a collider moves with the collision system instead
+    components = ('position', 'velocity')
+    excluded = ('collider',)
+
+    def process(self, archetype, delta_time):
+        x, y = archetype.view('x'), archetype.view('y')
+        delta_x, delta_y = archetype.view('delta_x'), archetype.view('delta_y')
+
+        if numpy is not None:
+            x += delta_x.astype(numpy.int64)
+            y += delta_y.astype(numpy.int64)
+        else:
+            for row in range(len(x)):
+                x[row] += int(delta_x[row])
+                y[row] += int(delta_y[row])
+
+
+class TileCollisionSystem(System):
+    # Moves entities against a level's tile grid the same way the player and enemies do
+    components = ('position', 'velocity', 'collider')
+
+    def __init__(self, tiles):
+        self.tiles = tiles
+
+    def process(self, archetype, delta_time):
+        columns = archetype.columns
+        x, y = columns['x'], columns['y']
+        delta_x, delta_y = columns['delta_x'], columns['delta_y']
+        width, height = columns['width'], columns['height']
+
+        # One rect reused for every entity
+        rect = pygame.Rect(0, 0, 0, 0)
+
+        for row in range(len(archetype)):
+            if delta_x[row] == 0 and delta_y[row] == 0:
+                continue
+
+            rect.update(x[row], y[row], width[row], height[row])
+
+            if delta_x[row] != 0:
+                rect.x += int(delta_x[row])
+                self.tiles.sweep_x(rect, delta_x[row])
+
+            if delta_y[row] != 0:
+                rect.y += int(delta_y[row])
+                if self.tiles.sweep_y(rect, delta_y[row]):
+                    delta_y[row] = 0
+
+            x[row] = rect.x
+            y[row] = rect.y
+
+
+class RenderSystem(System):
+    # Draws every sprite the camera can see with one blits call
+    components = ('position', 'sprite')
+
+    def __init__(self, margin=64):
+        # How far off screen a sprite can start and still be seen
+        self.margin = margin
+
+    def draw(self, world, screen, camera):
+        view_rect = camera.view_rect(self.margin)
+        offset_x, offset_y = camera.state.topleft
+
+        sprites = []
+
+        for archetype in world.query(self.components):
+            surfaces = archetype.columns['surface']
+
+            if numpy is not None:
+                x, y = archetype.view('x'), archetype.view('y')
+                visible = numpy.nonzero((x >= view_rect.left) & (x < view_rect.right) & (y >= view_rect.top) & (y < view_rect.bottom))[0]
+                screen_x = (x[visible] + offset_x).tolist()
+                screen_y = (y[visible] + offset_y).tolist()
+
+                sprites += zip([surfaces[row] for row in visible.tolist()], zip(screen_x, screen_y))
+            else:
+                x, y = archetype.columns['x'], archetype.columns['y']
+
+                for row in range(len(archetype)):
+                    if view_rect.collidepoint(x[row], y[row]):
+                        sprites.append((surfaces[row], (x[row] + offset_x, y[row] + offset_y)))
+
+        screen.blits(sprites, False)
+
+
+# /===================================/
+#  Adapters
+#  Fill a world from the usual game objects and levels
+# /===================================/
+
+
+def get_object_components(game_object, layer_number=None):
+    # The components that describe a game object
+    components = {
+        'position': (game_object.rect.x, game_object.rect.y),
+        'collider': (game_object.rect.width, game_object.rect.height)
+    }
+
+    # End blocks are never drawn so they don't need a sprite
+    if isinstance(game_object, extended.DrawableGameObject) and not isinstance(game_object, extended.EndBlock):
+        components['sprite'] = (game_object.surface,)
+
+    # Anything with a velocity moves, anything that can be grounded falls
+    if hasattr(game_object, 'delta_x') and hasattr(game_object, 'delta_y'):
+        components['velocity'] = (game_object.delta_x, game_object.delta_y)
+
+    if hasattr(game_object, 'grounded'):
+        components['gravity'] = ()
+
+    if layer_number is not None:
+        components['layer'] = (layer_number,)
+
+    # The class is the behaviour tag so systems can pick out enemies and the like
+    components[type(game_object).__name__] = ()
+
+    return components
+
+
+def add_game_object(world, game_object, layer_number=None):
+    return world.create(get_object_components(game_object, layer_number))
+
+
+def add_level(world, level):
+    # Every object in a level that's already been built
+    entities = []
+
+    for layer_number, level_layer in level.layers.items():
+        for level_object in level_layer:
+            entities.append(add_game_object(world, level_object, layer_number))
+
+    return entities
+
+
+def add_level_file(world, file_name, width_constant, object_dict):
+    # Straight from the compiled level file without making an object for every tile
+    # The objects in the object dictionary say what each kind of tile looks like
+    level_file = extended.load_level_file(file_name)
+    columns = level_file.columns
+
+    entities = []
+
+    for key, (template, layer_number) in object_dict.items():
+        components = get_object_components(template, layer_number)
+
+        for index in level_file.positions.get(key, ()):
+            components['position'] = ((index % columns) * width_constant, (index // columns) * width_constant)
+            entities.append(world.create(components))
+
+    return entities
@@ -2,8 +2,18 @@ import pygame
 import os
 import time
 import math
+import array
+import mmap
+import struct
+import threading
 from . import base
 
+# NumPy is only needed for batched physics
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 # /===================================/
 #  Drawable game object class
@@ -11,6 +21,14 @@ from . import base
 
 
 class DrawableGameObject(base.GameObject):
+    __slots__ = ('width', 'height', 'surface', 'rect', 'surface_shared')
+
+    # Objects that always look the same set this so every one of a size shares a surface
+    shared_surface = False
+
+    # The shared surfaces by (class, width, height)
+    shared_surfaces = {}
+
     def __init__(self, scene=None, x=0, y=0, width=100, height=100):
         super().__init__(scene, x, y)
 
@@ -18,19 +36,43 @@ class DrawableGameObject(base.GameObject):
         self.width = width
         self.height = height
 
-        # The surface
-        self.surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-
         # The rect
-        self.rect = self.surface.get_rect()
+        self.rect = pygame.Rect(0, 0, int(self.width), int(self.height))
 
         # Set the x and y
         self.rect.x = x
         self.rect.y = y
 
-        # Call the update method
+        # Whether the surface belongs to other objects too, don't draw on it if it does
+        self.surface_shared = self.shared_surface
 
-        self._update()
+        if self.shared_surface:
+            key = (type(self), self.width, self.height)
+
+            # The first one draws it for everyone else
+            self.surface = DrawableGameObject.shared_surfaces.get(key)
+            if self.surface is None:
+                self.surface = self.create_surface()
+                self._update()
+                DrawableGameObject.shared_surfaces[key] = self.surface
+        else:
+            # The surface
+            self.surface = self.create_surface()
+
+            # Call the update method
+            self._update()
+
+    def create_surface(self):
+        # Blank surface for _update to draw on
+        return pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+
+    def own_surface(self):
+        # Copy a shared surface before changing how this object looks
+        if self.surface_shared:
+            self.surface = self.surface.copy()
+            self.surface_shared = False
+
+        return self.surface
 
     def _update(self):
         raise NotImplementedError('_update not defined in subclass')
@@ -48,6 +90,19 @@ class DrawableGameObject(base.GameObject):
     def on_update(self, *args, **kwargs):
         pass
 
+    def wants_update(self):
+        # Only objects that override on_update need calling every frame
+        return type(self).on_update is not DrawableGameObject.on_update
+
+
+# Collision objects can be a plain list or a spatial grid
+# Grids only hand back the objects around the rect
+def get_colliders(collision_objects, rect):
+    if isinstance(collision_objects, base.SpatialGrid):
+        return collision_objects.query(rect)
+
+    return collision_objects
+
 
 # /===================================/
 #  Menu scene class
@@ -55,21 +110,44 @@ class DrawableGameObject(base.GameObject):
 
 
 class MenuScene(base.Scene):
-    def __init__(self, director=None, name=None, buttons=None, background=None, music=None):
+    # Menus only change when a button does
+    uses_dirty_rects = True
+
+    def __init__(self, director=None, name=None, buttons=None, background=None, music=None, static_elements=None):
         super().__init__(director, name)
 
+        # The button states as of the last draw
+        self._drawn_states = None
+
+        # The background and static elements put together, made on the first draw
+        self.static_frame = None
+
+        self.buttons = []
+        self.background = None
+        self.static_elements = []
+
         if buttons is not None:
             if type(buttons) is list:
                 self.buttons = buttons
             else:
                 raise Exception('Buttons is not a list')
 
+        # Hands mouse events to the buttons
+        self.dispatcher = base.GUIDispatcher(self.buttons)
+
         if background is not None:
             if type(background) is BackgroundImage:
                 self.background = background
             else:
                 raise Exception('Image is not BackgroundImage')
 
+        # Things drawn over the background that never change, like text
+        if static_elements is not None:
+            if type(static_elements) is list:
+                self.static_elements = static_elements
+            else:
+                raise Exception('Static elements is not a list')
+
         if music is not None:
             if type(music) is list:
                 self.music = pygame.mixer.Sound(os.path.join(*music))
@@ -82,21 +160,54 @@ class MenuScene(base.Scene):
     def on_update(self):
         pass
 
+    def is_idle(self):
+        # Buttons only change when the mouse does something
+        return True
+
     def on_event(self, events):
-        for event in events:
-            # If event is mouse related
-            if event.type in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONUP, pygame.MOUSEBUTTONDOWN):
-                # Send the mouse event to every button
-                for button in self.buttons:
-                    button.handle_event(event)
+        # Mouse events only go to the buttons under the cursor, the ones it just left and any held down
+        self.dispatcher.dispatch(events)
+
+    def build_static_frame(self, screen):
+        # Everything that isn't a button, drawn once
+        self.static_frame = pygame.Surface(screen.get_size()).convert()
+        self.static_frame.fill(base.Colors.BLACK)
+
+        if self.background is not None:
+            self.background.draw(self.static_frame)
+
+        for element in self.static_elements:
+            element.draw(self.static_frame)
+
+    def invalidate_static_frame(self):
+        # Call this if the background or a static element changes
+        self.static_frame = None
+        self.mark_dirty()
 
     def on_draw(self, screen):
-        # Draw the background first
-        self.background.draw(screen)
+        if self.static_frame is None:
+            self.build_static_frame(screen)
+
+        button_states = [(button._visible, button.button_toggled, button.mouse_over_button) for button in self.buttons]
+
+        # The whole screen has to be drawn so start from the static frame
+        if self.full_redraw or self._drawn_states is None:
+            screen.blit(self.static_frame, (0, 0))
 
-        # Draw buttons over background
-        for button in self.buttons:
-            button.draw(screen)
+            for button in self.buttons:
+                button.draw(screen)
+
+            self.mark_dirty()
+        # Otherwise only the buttons that changed
+        else:
+            for button, button_state, drawn_state in zip(self.buttons, button_states, self._drawn_states):
+                if button_state != drawn_state:
+                    # Cover the old look with whatever's under the button then draw the new one
+                    screen.blit(self.static_frame, button.rect, button.rect)
+                    button.draw(screen)
+                    self.mark_dirty(button.rect)
+
+        self._drawn_states = button_states
 
     def handle_command(self):
         pass
@@ -152,20 +263,31 @@ class BackgroundImage(base.Image):
             new_height = destination_height
 
         # Transform the image based off the ratio
-        scaled_image = pygame.transform.scale(self._source_image, (int(new_width), int(new_height))).convert()
+        # Scaled copies come from the cache so backgrounds with the same size share one
+        if self._image_file is None:
+            scaled_image = pygame.transform.scale(self._source_image, (int(new_width), int(new_height))).convert()
+        else:
+            scaled_image = base.ASSET_CACHE.load_image(self._image_file, (int(new_width), int(new_height)))
 
         # Get the rect
         scaled_rect = scaled_image.get_rect()
         scaled_rect.center = int(self.rect.width / 2), int(self.rect.height / 2)
 
-        # Blit it
-        self.surface.blit(scaled_image, scaled_rect)
+        # If the image covers the whole rect draw straight from the scaled copy
+        if scaled_rect.contains((0, 0, self.rect.width, self.rect.height)):
+            self.surface = scaled_image
+            self._area = pygame.Rect(-scaled_rect.x, -scaled_rect.y, self.rect.width, self.rect.height)
+        # Otherwise it needs black bars so blit it to our own surface
+        else:
+            self.surface = pygame.Surface(self.rect.size)
+            self.surface.blit(scaled_image, scaled_rect)
+            self._area = pygame.Rect(0, 0, self.rect.width, self.rect.height)
 
     def draw(self, screen, optional_rect=None):
         if optional_rect is None:
-            screen.blit(self.surface, self.rect, (0, 0, self.rect.width, self.rect.height))
+            screen.blit(self.surface, self.rect, self._area)
         else:
-            screen.blit(self.surface, optional_rect, (0, 0, self.rect.width, self.rect.height))
+            screen.blit(self.surface, optional_rect, self._area)
 
 
 # /===================================/
@@ -259,6 +381,10 @@ class GameScene(base.Scene):
 
 
 class Wall(DrawableGameObject):
+    __slots__ = ()
+
+    shared_surface = True
+
     def _update(self):
         self.surface.fill(base.Colors.BLUE)
 
@@ -271,6 +397,7 @@ class Wall(DrawableGameObject):
 # /===================================/
 
 
+# No slots so the player keeps a __dict__ for anything scenes want to hang off it
 class Player(DrawableGameObject):
     def __init__(self, scene=None, x=0, y=0, width=32, height=32, movement_rate=3, dead_animation=None):
         # Movement rate
@@ -332,39 +459,53 @@ class Player(DrawableGameObject):
         self.delta_y = min(15, self.delta_y)
 
         # Move ourselves on the x axis
+        start_rect = self.rect.copy()
         self.rect.x += int(self.delta_x)
 
-        for wall in collision_objects:
-            # If we actually changed positions
+        # Grid aligned levels can just look up the tiles we're in
+        if isinstance(collision_objects, TileGrid):
             if self.delta_x != 0:
-                # If we collide with something and its not ourselves
-                if self.rect.colliderect(wall.rect) and wall.id != self.id:
-                    # If we're going right, then reset our right edge
-                    if self.delta_x > 0:
-                        self.rect.right = wall.rect.left
-                    # If we're going left, reset our left edge
-                    elif self.delta_x < 0:
-                        self.rect.left = wall.rect.right
+                collision_objects.sweep_x(self.rect, self.delta_x)
+        else:
+            # Only the walls between where we were and where we are
+            for wall in get_colliders(collision_objects, self.rect.union(start_rect)):
+                # If we actually changed positions
+                if self.delta_x != 0:
+                    # If we collide with something and its not ourselves
+                    if self.rect.colliderect(wall.rect) and wall.id != self.id:
+                        # If we're going right, then reset our right edge
+                        if self.delta_x > 0:
+                            self.rect.right = wall.rect.left
+                        # If we're going left, reset our left edge
+                        elif self.delta_x < 0:
+                            self.rect.left = wall.rect.right
 
         # Move ourselves on the y axis
+        start_rect = self.rect.copy()
         self.rect.y += int(self.delta_y)
 
-        for wall in collision_objects:
-            # If we actually changed positions
-            if self.delta_y != 0:
-                # If we collide with something and its not ourselves
-                if self.rect.colliderect(wall.rect) and wall.id != self.id:
-                    # If we're going up, then reset our top edge
-                    if self.delta_y > 0:
-                        self.rect.bottom = wall.rect.top
-                        # Not needed anymore but I'll keep it here anyway
-                        self.grounded = True
-                    # If we're going down, then reset our bottom edge
-                    elif self.delta_y < 0:
-                        self.rect.top = wall.rect.bottom
-                        self.grounded = False
-
-                    self.delta_y = 0
+        if isinstance(collision_objects, TileGrid):
+            # If we actually changed positions and hit something
+            if self.delta_y != 0 and collision_objects.sweep_y(self.rect, self.delta_y):
+                self.grounded = self.delta_y > 0
+                self.delta_y = 0
+        else:
+            for wall in get_colliders(collision_objects, self.rect.union(start_rect)):
+                # If we actually changed positions
+                if self.delta_y != 0:
+                    # If we collide with something and its not ourselves
+                    if self.rect.colliderect(wall.rect) and wall.id != self.id:
+                        # If we're going up, then reset our top edge
+                        if self.delta_y > 0:
+                            self.rect.bottom = wall.rect.top
+                            # Not needed anymore but I'll keep it here anyway
+                            self.grounded = True
+                        # If we're going down, then reset our bottom edge
+                        elif self.delta_y < 0:
+                            self.rect.top = wall.rect.bottom
+                            self.grounded = False
+
+                        self.delta_y = 0
 
     def duplicate(self):
         return Player(self.scene, self.rect.x, self.rect.y, self.rect.width, self.rect.height, self.movement_rate, self.dead_animation)
@@ -378,8 +519,12 @@ class Player(DrawableGameObject):
         # one unit below the original rect
         checking_rect = pygame.Rect(int(self.rect.x), int(self.rect.y + self.rect.height), int(self.rect.width), 1)
 
+        # Grid aligned levels just check the tiles under us
+        if isinstance(collision_objects, TileGrid):
+            return collision_objects.is_blocked(checking_rect)
+
         # For each object that we can be grounded on
-        for wall in collision_objects:
+        for wall in get_colliders(collision_objects, checking_rect):
             # Check if the rect collides with it
             if checking_rect.colliderect(wall.rect):
                 colliding = True
@@ -415,19 +560,328 @@ class Utility:
         return w_center, h_center
 
 
+# /===================================/
+#  Tile grid class
+#  One byte per tile saying whether it's solid
+#  Collisions just index the tiles a rect covers instead of testing rects
+# /===================================/
+
+
+class TileGrid:
+    def __init__(self, columns, rows, tile_size):
+        self.columns = columns
+        self.rows = rows
+        self.tile_size = tile_size
+
+        # Row by row, 1 for solid and 0 for empty
+        self.cells = array.array('B', bytes(columns * rows))
+
+    def set_solid(self, column, row, solid=True):
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            self.cells[row * self.columns + column] = 1 if solid else 0
+
+    def is_solid(self, column, row):
+        # Nothing outside the level
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            return self.cells[row * self.columns + column] == 1
+
+        return False
+
+    def get_tile_range(self, rect):
+        # The first and last tile the rect covers on each axis
+        size = self.tile_size
+        return rect.left // size, rect.top // size, (rect.right - 1) // size, (rect.bottom - 1) // size
+
+    def get_solid_tiles(self, rect):
+        # Every solid tile the rect covers, row by row
+        first_column, first_row, last_column, last_row = self.get_tile_range(rect)
+        return [(column, row) for row in range(first_row, last_row + 1) for column in range(first_column, last_column + 1) if self.is_solid(column, row)]
+
+    def is_blocked(self, rect):
+        return len(self.get_solid_tiles(rect)) > 0
+
+    def sweep_x(self, rect, delta_x):
+        # Call after moving the rect on the x axis, pushes it back out of any solid tile
+        solid_tiles = self.get_solid_tiles(rect)
+        if len(solid_tiles) == 0:
+            return False
+
+        # Stop at the first solid column in the direction we're going
+        if delta_x > 0:
+            rect.right = min(column for column, row in solid_tiles) * self.tile_size
+        elif delta_x < 0:
+            rect.left = (max(column for column, row in solid_tiles) + 1) * self.tile_size
+
+        return True
+
+    def sweep_y(self, rect, delta_y):
+        # Call after moving the rect on the y axis, pushes it back out of any solid tile
+        solid_tiles = self.get_solid_tiles(rect)
+        if len(solid_tiles) == 0:
+            return False
+
+        # Stop at the first solid row in the direction we're going
+        if delta_y > 0:
+            rect.bottom = min(row for column, row in solid_tiles) * self.tile_size
+        elif delta_y < 0:
+            rect.top = (max(row for column, row in solid_tiles) + 1) * self.tile_size
+
+        return True
+
+    def merge_rects(self):
+        # Greedy meshing, grow each solid tile right as far as it goes then down as far as the whole run goes
+        # Gives far fewer rects than one per tile for rect based collisions
+        merged = []
+        used = array.array('B', bytes(self.columns * self.rows))
+
+        for row in range(self.rows):
+            column = 0
+            while column < self.columns:
+                index = row * self.columns + column
+
+                # Skip empty tiles and tiles already in a rect
+                if self.cells[index] == 0 or used[index] == 1:
+                    column += 1
+                    continue
+
+                # Grow right
+                width = 1
+                while column + width < self.columns and self.cells[index + width] == 1 and used[index + width] == 0:
+                    width += 1
+
+                # Grow down while every tile in the run is free
+                height = 1
+                while row + height < self.rows:
+                    start = (row + height) * self.columns + column
+                    if all(self.cells[start + i] == 1 and used[start + i] == 0 for i in range(width)):
+                        height += 1
+                    else:
+                        break
+
+                # Mark the tiles as used
+                for used_row in range(row, row + height):
+                    for used_column in range(column, column + width):
+                        used[used_row * self.columns + used_column] = 1
+
+                merged.append(pygame.Rect(column * self.tile_size, row * self.tile_size, width * self.tile_size, height * self.tile_size))
+                column += width
+
+        return merged
+
+
+# /===================================/
+#  Collider class
+#  An invisible rect that things bump into
+#  Used for the merged wall rects
+# /===================================/
+
+
+class Collider(base.GameObject):
+    __slots__ = ('rect',)
+
+    def __init__(self, rect):
+        super().__init__(None, rect[0], rect[1])
+
+        self.rect = pygame.Rect(rect)
+
+
+# /===================================/
+#  Compiled level class
+#  Level text files get compiled into a binary file next to them the first time they're loaded
+#  Header: magic, version, columns, rows, source mtime and size, legend size
+#  Legend: each character that isn't a space with how many times it appears
+#  Then the tile index of every appearance for each legend entry in turn, as uint32s
+#  Then the grid itself, one byte per tile, rows padded with spaces
+# /===================================/
+
+
+LEVEL_MAGIC = b'ZLVL'
+LEVEL_VERSION = 1
+# Native byte order like the tile indices, compiled files aren't meant to be moved between machines
+LEVEL_HEADER = struct.Struct('=4sBxxxIIqqI')
+LEVEL_LEGEND_ENTRY = struct.Struct('=cxxxI')
+
+
+class CompiledLevel:
+    def __init__(self, buffer):
+        # Everything is a view into the buffer, nothing gets copied out
+        self.buffer = memoryview(buffer)
+
+        magic, version, self.columns, self.rows, self.source_mtime, self.source_size, legend_size = LEVEL_HEADER.unpack_from(self.buffer)
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            raise Exception('Not a compiled level file')
+
+        offset = LEVEL_HEADER.size
+
+        legend = []
+        for _ in range(legend_size):
+            legend.append(LEVEL_LEGEND_ENTRY.unpack_from(self.buffer, offset))
+            offset += LEVEL_LEGEND_ENTRY.size
+
+        # Where each character appears, as tile indices
+        self.positions = {}
+        for character, count in legend:
+            self.positions[character.decode('latin-1')] = self.buffer[offset:offset + count * 4].cast('I')
+            offset += count * 4
+
+        # The tile characters row by row
+        self.grid = self.buffer[offset:offset + self.columns * self.rows]
+
+    def is_stale(self, source_file):
+        source_stat = os.stat(source_file)
+        return source_stat.st_mtime_ns != self.source_mtime or source_stat.st_size != self.source_size
+
+
+def compile_level(source_file):
+    # Read the text the same way levels always have been, no trailing spaces or empty lines
+    with open(source_file) as fn:
+        level_data = list(filter(None, [line.rstrip() for line in fn.readlines()]))
+
+    columns = max(len(row) for row in level_data)
+    rows = len(level_data)
+
+    # One byte per tile
+    # Characters that don't fit in a byte can't be tiles so they're left empty like any other unknown character, BOMs included
+    level_text = ''.join(row.ljust(columns) for row in level_data)
+    grid = ''.join(character if ord(character) < 256 else ' ' for character in level_text).encode('latin-1')
+
+    # Every tile index for each character, spaces are empty so they're left out
+    positions = {}
+    for index, character in enumerate(grid):
+        if character != 32:
+            positions.setdefault(character, array.array('I')).append(index)
+
+    source_stat = os.stat(source_file)
+    chunks = [LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, columns, rows, source_stat.st_mtime_ns, source_stat.st_size, len(positions))]
+
+    for character, indices in positions.items():
+        chunks.append(LEVEL_LEGEND_ENTRY.pack(bytes([character]), len(indices)))
+
+    for indices in positions.values():
+        chunks.append(indices.tobytes())
+
+    chunks.append(grid)
+
+    return b''.join(chunks)
+
+
+def get_compiled_file(source_file):
+    return os.path.splitext(source_file)[0] + '.lvl'
+
+
+# Compiled levels that are already open, kept so levels can be read ahead of time on another thread
+LEVEL_FILES = base.LRUCache(16)
+
+
+def load_level_file(file_name):
+    source_file = os.path.join(*file_name)
+
+    level_file = LEVEL_FILES.get(source_file)
+    if level_file is not None and not level_file.is_stale(source_file):
+        return level_file
+
+    compiled_file = get_compiled_file(source_file)
+    level_file = None
+
+    # Map the compiled file if it's there and still matches the text
+    try:
+        with open(compiled_file, 'rb') as fn:
+            level_file = CompiledLevel(mmap.mmap(fn.fileno(), 0, access=mmap.ACCESS_READ))
+
+        if level_file.is_stale(source_file):
+            level_file = None
+    except Exception:
+        # Missing, empty or from another version
+        level_file = None
+
+    if level_file is None:
+        compiled_data = compile_level(source_file)
+
+        # Save it for next time, if we can't then just use it from memory
+        # Each thread writes its own temporary file so a prefetch can't clash with a load
+        temporary_file = '%s.%d.tmp' % (compiled_file, threading.get_ident())
+        try:
+            with open(temporary_file, 'wb') as fn:
+                fn.write(compiled_data)
+
+            os.replace(temporary_file, compiled_file)
+        except OSError:
+            pass
+
+        level_file = CompiledLevel(compiled_data)
+
+    LEVEL_FILES.put(source_file, level_file)
+
+    return level_file
+
+
+def get_object_state(level_object):
+    # Where an object is and how it's moving
+    state = {'rect': level_object.rect.copy()}
+
+    for name in ('delta_x', 'delta_y', 'grounded', 'sim_state'):
+        if hasattr(level_object, name):
+            state[name] = getattr(level_object, name)
+
+    return state
+
+
+def set_object_state(level_object, state):
+    level_object.rect.update(state['rect'])
+
+    for name, value in state.items():
+        if name != 'rect':
+            setattr(level_object, name, value)
+
+
 # /===================================/
 #  Level interpreting class
 # /===================================/
 
 
 class Level:
-    def __init__(self, file_name, width_constant, object_dict):
+    def __init__(self, file_name, width_constant, object_dict, solid_layers=(1,), chunk_size=None):
         # Initialise the dictionary of all the objects in the layers
         self.layers = {}
 
         # Set the object dictionary
         self.object_dict = object_dict
 
+        # Size of each tile
+        self.width_constant = width_constant
+
+        # The layers that get marked in the tile grid
+        self.solid_layers = solid_layers
+
+        # Grid of solid tiles, stays None if a solid object isn't tile aligned
+        self.tiles = None
+
+        # Solid tiles merged into as few rects as possible, None without the tile grid
+        self.colliders = None
+
+        # The compiled level file, None if the level wasn't loaded from one
+        self.level_file = None
+
+        # With a chunk size only the chunks near the player have objects, see update_chunks
+        # It has to be a multiple of the width constant
+        self.chunk_size = chunk_size
+        self.streaming = chunk_size is not None
+
+        # The chunks with objects in them
+        self.loaded_chunks = set()
+
+        # The state of objects that were in each chunk when it was unloaded
+        self.saved_objects = {}
+
+        # The tile each object came from in the level file
+        self.spawn_indices = {}
+
+        # Tiles that don't spawn anything anymore, either it was removed or it's already been spawned
+        self.used_tiles = set()
+
+        # Loaded objects that move or were added while playing, they get saved when their chunk unloads
+        self.dynamic_objects = {}
+
         # For each key within the object dictionary
         for key in self.object_dict.keys():
             # Get its layer number
@@ -438,58 +892,289 @@ class Level:
 
         # If the level file sent is a list
         if type(file_name) is list:
-            # Join the array values into a file name
-            filename = os.path.join(*file_name)
-
-            # Initialise x and y for the spawning process
-            x = 0
-            y = 0
-
-            # With the level file
-            with open(filename) as fn:
-                # Get the lines/level data
-                level_data = fn.readlines()
-
-            # Initialise the interpreted data
-            new_level_data = []
-
-            # Strip the empty lines
-            for line in level_data:
-                new_level_data.append(line.rstrip())
-
-            # Strip empty stuff
-            level_data = list(filter(None, new_level_data))
-
-            # For each line in the level data file
-            for row in level_data:
-                # For each character on the line
-                for col in row:
-                    # For each key within the object dictionary
-                    for key in self.object_dict.keys():
-                        # If the character is equal the to the key
-                        if col == key:
-                            # Get its intended layer
-                            layer = self.object_dict[key][1]
-
-                            # Duplicate the object
-                            level_prop = self.object_dict[key][0].duplicate()
-
-                            # Set the x and y coordinates for this object
-                            level_prop.rect.x = x
-                            level_prop.rect.y = y
-
-                            # Add it to the layer its intended to be in
-                            self.layers[layer].append(level_prop)
-                    x += width_constant
-                y += width_constant
-
-                # Reset the x position at the beginning of each new line
-                x = 0
+            # Get the compiled level, it gets recompiled if the text changed
+            self.level_file = load_level_file(file_name)
+            columns = self.level_file.columns
+
+            # The keys that go in each layer
+            layer_keys = {}
+            for key in self.object_dict.keys():
+                layer_keys.setdefault(self.object_dict[key][1], []).append(key)
+
+            # Streaming levels only get their objects as chunks load
+            for layer, keys in layer_keys.items():
+                if self.streaming:
+                    break
+
+                # Every tile with one of the layer's keys, in the order they appear in the text
+                tile_indices = sorted(index for key in keys for index in self.level_file.positions.get(key, ()))
+
+                for index in tile_indices:
+                    # Duplicate the object
+                    level_prop = self.object_dict[chr(self.level_file.grid[index])][0].duplicate()
+
+                    # Set the x and y coordinates for this object
+                    level_prop.rect.x = (index % columns) * width_constant
+                    level_prop.rect.y = (index // columns) * width_constant
+
+                    # Add it to the layer its intended to be in
+                    self.layers[layer].append(level_prop)
 
             # Set the display value for the level width and height
             # At the moment this is only used in the camera
-            self.level_width = len(level_data[0]) * width_constant
-            self.level_height = len(level_data) * width_constant
+            self.level_width = columns * width_constant
+            self.level_height = self.level_file.rows * width_constant
+
+            # Mark the solid tiles
+            self.build_tiles()
+
+        # Index every layer by tile so we can find what's in an area
+        self.grids = {}
+        for layer_number, level_layer in self.layers.items():
+            self.grids[layer_number] = base.SpatialGrid(width_constant)
+
+            for level_object in level_layer:
+                self.grids[layer_number].insert(level_object)
+
+        # Merge the walls for collisions
+        self.build_colliders()
+
+    def build_tiles(self):
+        width_constant = self.width_constant
+        self.tiles = TileGrid(self.level_file.columns, self.level_file.rows, width_constant)
+
+        solid_keys = [key for key in self.object_dict.keys() if self.object_dict[key][1] in self.solid_layers]
+
+        # Tile sized solid objects are just their characters in the grid
+        if all(self.object_dict[key][0].rect.size == (width_constant, width_constant) for key in solid_keys):
+            solid_table = bytearray(256)
+            for key in solid_keys:
+                if ord(key) < 256:
+                    solid_table[ord(key)] = 1
+
+            self.tiles.cells = array.array('B', self.level_file.grid.tobytes().translate(solid_table))
+        # Streaming levels don't have the objects to mark tiles from
+        elif self.streaming:
+            self.tiles = None
+        else:
+            for layer_number in self.solid_layers:
+                for level_object in self.layers.get(layer_number, []):
+                    if not self.set_tiles(level_object.rect, True):
+                        # Can't use the tile grid for this level
+                        self.tiles = None
+                        return
+
+    def build_colliders(self):
+        # Compile the solid tiles into merged collision rects
+        # The objects stay as they are for drawing
+        # Streaming levels only ever have the walls near the player so they don't bother
+        if self.tiles is None or self.streaming:
+            self.colliders = None
+            return
+
+        self.colliders = base.SpatialGrid(self.width_constant)
+        for rect in self.tiles.merge_rects():
+            self.colliders.insert(Collider(rect))
+
+    def set_tiles(self, rect, solid):
+        # Only rects that exactly cover whole tiles can go in the tile grid
+        size = self.width_constant
+        if rect.x % size != 0 or rect.y % size != 0 or rect.width % size != 0 or rect.height % size != 0:
+            return False
+
+        for column in range(rect.x // size, rect.right // size):
+            for row in range(rect.y // size, rect.bottom // size):
+                self.tiles.set_solid(column, row, solid)
+
+        return True
+
+    def add(self, layer_number, level_object):
+        # Put a new object into a layer
+        self.layers[layer_number].append(level_object)
+        self.grids[layer_number].insert(level_object)
+
+        # Nothing in the level file can bring it back so it gets saved with its chunk
+        if self.streaming:
+            self.dynamic_objects[level_object] = layer_number
+
+        # Keep the tile grid in step
+        if layer_number in self.solid_layers and self.tiles is not None:
+            if not self.set_tiles(level_object.rect, True):
+                self.tiles = None
+
+            self.build_colliders()
+
+    def remove(self, layer_number, level_object):
+        # Take an object out of a layer
+        self.remove_objects([(layer_number, level_object)])
+
+    def remove_objects(self, objects):
+        # Take (layer number, object) pairs out for good, walking each layer once however many there are
+        for layer_number, level_object in objects:
+            self.grids[layer_number].remove(level_object)
+
+            # Don't spawn it again when its chunk reloads
+            if level_object in self.spawn_indices:
+                self.used_tiles.add(self.spawn_indices.pop(level_object))
+
+            self.dynamic_objects.pop(level_object, None)
+
+        removed = {level_object for layer_number, level_object in objects}
+        for layer_number in {layer_number for layer_number, level_object in objects}:
+            self.layers[layer_number][:] = [level_object for level_object in self.layers[layer_number] if level_object not in removed]
+
+        # Keep the tile grid in step
+        solid_objects = [level_object for layer_number, level_object in objects if layer_number in self.solid_layers]
+        if len(solid_objects) > 0 and self.tiles is not None:
+            for level_object in solid_objects:
+                self.set_tiles(level_object.rect, False)
+
+            self.build_colliders()
+
+    def track(self, layer_number, level_object):
+        # Index an object that isn't part of a layer, like the player
+        self.grids.setdefault(layer_number, base.SpatialGrid(self.width_constant)).insert(level_object)
+
+    def query(self, layer_number, rect):
+        # The objects in a layer that touch the rect
+        return self.grids[layer_number].query(rect)
+
+    def get_chunk_key(self, rect):
+        # Objects belong to the chunk their top left corner is in
+        return rect.x // self.chunk_size, rect.y // self.chunk_size
+
+    def get_chunk_keys(self, rect):
+        # Every chunk in the level the rect touches
+        rect = pygame.Rect(rect).clip((0, 0, self.level_width, self.level_height))
+        if rect.width == 0 or rect.height == 0:
+            return set()
+
+        size = self.chunk_size
+        return {(x, y) for x in range(rect.left // size, (rect.right - 1) // size + 1) for y in range(rect.top // size, (rect.bottom - 1) // size + 1)}
+
+    def get_chunk_changes(self, rect):
+        # The chunks to load because they're in the rect
+        # And the chunks to unload because they're more than a chunk outside it, so walking back and forth doesn't churn
+        load_keys = self.get_chunk_keys(rect) - self.loaded_chunks
+        unload_keys = self.loaded_chunks - self.get_chunk_keys(pygame.Rect(rect).inflate(self.chunk_size * 2, self.chunk_size * 2))
+
+        return load_keys, unload_keys
+
+    def load_chunk(self, key):
+        # Put a chunk's objects in the level, returns [layer, object] for each of them
+        loaded = []
+
+        size = self.chunk_size // self.width_constant
+        columns = self.level_file.columns
+        grid = self.level_file.grid
+
+        # Spawn whatever the level file has in the chunk
+        for row in range(key[1] * size, min((key[1] + 1) * size, self.level_file.rows)):
+            first_index = row * columns + key[0] * size
+            row_data = grid[first_index:row * columns + min((key[0] + 1) * size, columns)].tobytes()
+
+            for offset, character in enumerate(row_data):
+                # Spaces are empty
+                if character == 32:
+                    continue
+
+                index = first_index + offset
+                template = self.object_dict.get(chr(character))
+                if template is None or index in self.used_tiles:
+                    continue
+
+                level_object = template[0].duplicate()
+                level_object.rect.x = (index % columns) * self.width_constant
+                level_object.rect.y = row * self.width_constant
+                self.spawn_indices[level_object] = index
+
+                # Things that move only get spawned once, after that they're saved with whatever chunk they're in
+                if level_object.wants_update():
+                    self.used_tiles.add(index)
+                    self.dynamic_objects[level_object] = template[1]
+
+                loaded.append([template[1], level_object])
+
+        # Bring back what was saved when the chunk unloaded
+        for layer_number, index, level_object, state in self.saved_objects.pop(key, []):
+            if level_object is None:
+                level_object = self.object_dict[chr(grid[index])][0].duplicate()
+                self.spawn_indices[level_object] = index
+
+            set_object_state(level_object, state)
+            self.dynamic_objects[level_object] = layer_number
+
+            loaded.append([layer_number, level_object])
+
+        for layer_number, level_object in loaded:
+            self.layers[layer_number].append(level_object)
+            self.grids[layer_number].insert(level_object)
+
+        self.loaded_chunks.add(key)
+
+        return loaded
+
+    def unload_chunks(self, keys):
+        # Returns [layer, object] for everything that has to go, pass them to forget_objects
+        self.loaded_chunks.difference_update(keys)
+
+        leaving = {}
+
+        # Everything sitting in the chunks
+        for key in keys:
+            chunk_rect = pygame.Rect(key[0] * self.chunk_size, key[1] * self.chunk_size, self.chunk_size, self.chunk_size)
+
+            for layer_number, level_grid in self.grids.items():
+                if layer_number not in self.layers:
+                    continue
+
+                for level_object in level_grid.query(chunk_rect):
+                    if self.get_chunk_key(level_object.rect) == key:
+                        leaving[level_object] = layer_number
+
+        # And anything that wandered off into a chunk that isn't loaded
+        for level_object, layer_number in self.dynamic_objects.items():
+            if self.get_chunk_key(level_object.rect) not in self.loaded_chunks:
+                leaving[level_object] = layer_number
+
+        return [[layer_number, level_object] for level_object, layer_number in leaving.items()]
+
+    def forget_objects(self, objects):
+        # Take unloaded objects out, saving anything the level file can't spawn again
+        for layer_number, level_object in objects:
+            if level_object in self.dynamic_objects:
+                index = self.spawn_indices.get(level_object)
+
+                # Objects from the level file get rebuilt from their tile so only the state is kept
+                saved_object = None if index is not None else level_object
+                self.saved_objects.setdefault(self.get_chunk_key(level_object.rect), []).append([layer_number, index, saved_object, get_object_state(level_object)])
+
+                del self.dynamic_objects[level_object]
+
+            self.spawn_indices.pop(level_object, None)
+            self.grids[layer_number].remove(level_object)
+
+        # One pass over each layer instead of a remove for every object
+        forgotten = {level_object for layer_number, level_object in objects}
+        for layer_number, level_layer in self.layers.items():
+            level_layer[:] = [level_object for level_object in level_layer if level_object not in forgotten]
+
+    def reset_chunks(self):
+        # Unload everything and forget what happened, the level file is all that's left
+        for layer_number, level_layer in self.layers.items():
+            for level_object in level_layer:
+                self.grids[layer_number].remove(level_object)
+
+            level_layer[:] = []
+
+        self.loaded_chunks = set()
+        self.saved_objects = {}
+        self.spawn_indices = {}
+        self.used_tiles = set()
+        self.dynamic_objects = {}
+
+        # Removed walls come back
+        self.build_tiles()
 
     # Have the layers accessible without calling level.layers[i]
     # But rather level[i]
@@ -497,27 +1182,137 @@ class Level:
         return self.layers[item]
 
 
+# /===================================/
+#  Static layer class
+#  Bakes objects that never move into big chunk surfaces
+#  So drawing them is a few blits instead of one per tile
+# /===================================/
+
+
+class StaticLayer:
+    def __init__(self, objects, level_width, level_height, chunk_size=512):
+        # Size of each baked chunk in pixels
+        self.chunk_size = chunk_size
+
+        # Chunks never go past the edge of the level
+        self.level_rect = pygame.Rect(0, 0, level_width, level_height)
+
+        # The objects touching each chunk, keyed by chunk coordinates
+        self.chunk_objects = {}
+
+        # The baked surface and level rect for each chunk
+        self.chunks = {}
+
+        # Chunks that need baking before they're drawn
+        self.dirty_chunks = set()
+
+        for level_object in objects:
+            self.add(level_object)
+
+    def get_chunk_keys(self, rect):
+        # Every chunk the rect touches
+        size = self.chunk_size
+        return [(x, y) for x in range(rect.left // size, (rect.right - 1) // size + 1) for y in range(rect.top // size, (rect.bottom - 1) // size + 1)]
+
+    def add(self, level_object):
+        for key in self.get_chunk_keys(level_object.rect):
+            self.chunk_objects.setdefault(key, []).append(level_object)
+            self.dirty_chunks.add(key)
+
+    def remove(self, level_object):
+        for key in self.get_chunk_keys(level_object.rect):
+            if level_object in self.chunk_objects.get(key, []):
+                self.chunk_objects[key].remove(level_object)
+                self.dirty_chunks.add(key)
+
+                # Let go of chunks that are empty now, like ones a streaming level unloaded
+                if len(self.chunk_objects[key]) == 0:
+                    del self.chunk_objects[key]
+                    self.chunks.pop(key, None)
+                    self.dirty_chunks.discard(key)
+
+    def invalidate(self, rect):
+        # Call this when a static object changes its look
+        self.dirty_chunks.update(self.get_chunk_keys(pygame.Rect(rect)))
+
+    def bake(self, key):
+        # Work out where the chunk sits in the level
+        chunk_rect = pygame.Rect(key[0] * self.chunk_size, key[1] * self.chunk_size, self.chunk_size, self.chunk_size).clip(self.level_rect)
+
+        # Empty chunks don't need a surface
+        if not self.chunk_objects.get(key) or chunk_rect.width == 0 or chunk_rect.height == 0:
+            self.chunks.pop(key, None)
+            return
+
+        # Transparent so the background shows through the gaps
+        surface = pygame.Surface(chunk_rect.size, pygame.SRCALPHA)
+
+        # Draw each object relative to the chunk
+        for level_object in self.chunk_objects[key]:
+            level_object.draw(surface, level_object.rect.move(-chunk_rect.x, -chunk_rect.y))
+
+        self.chunks[key] = (surface, chunk_rect)
+
+    def draw(self, screen, camera):
+        # The screen rects of chunks that were rebaked this frame
+        rebaked = []
+
+        # Only the chunks the camera can see
+        for key in self.get_chunk_keys(camera.view_rect()):
+            if key in self.dirty_chunks:
+                self.dirty_chunks.discard(key)
+                self.bake(key)
+
+                if key in self.chunks:
+                    rebaked.append(self.chunks[key][1].move(camera.state.topleft))
+
+            if key in self.chunks:
+                surface, chunk_rect = self.chunks[key]
+                screen.blit(surface, (chunk_rect.x + camera.state.x, chunk_rect.y + camera.state.y))
+
+        return rebaked
+
+
 # /===================================/
 #  Image object class
 # /===================================/
 
 
 class ImageObject(DrawableGameObject):
+    __slots__ = ('_image_file', '_source')
+
     def __init__(self, scene=None, x=0, y=0, width=100, height=100, image_surface=None):
         # If image file then load it
         if type(image_surface) is list:
-            self._source = pygame.image.load(os.path.join(*image_surface)).convert()
-        # If surface then copy it
+            self._image_file = image_surface
+            self._source = base.ASSET_CACHE.load_image(image_surface)
+        # If surface then share it, it doesn't get drawn on
         else:
-            self._source = image_surface.copy()
+            self._image_file = None
+            self._source = image_surface
 
         super().__init__(scene, x, y, width, height)
 
+    def create_surface(self):
+        # _update picks the surface
+        return None
+
     def _update(self):
-        # Transform the image to fit dimensions
-        self.surface = pygame.transform.scale(self._source, (int(self.width), int(self.height))).convert()
+        size = (int(self.width), int(self.height))
+
+        # Transform the image to fit dimensions, unless it already does
+        if self._source.get_size() == size:
+            self.surface = self._source
+        elif self._image_file is not None:
+            self.surface = base.ASSET_CACHE.load_image(self._image_file, size)
+        else:
+            self.surface = pygame.transform.scale(self._source, size).convert()
+
+        # Either way it's the image's, not ours
+        self.surface_shared = True
 
     def duplicate(self):
+        # Duplicates share our already sized surface
         return ImageObject(self.scene, self.rect.x, self.rect.y, self.width, self.height, self.surface)
 
 
@@ -530,9 +1325,9 @@ class LoadedImages:
     def __init__(self, *args):
         self.assets = {}
         # For each file reference sent
-        # Load it in and make a surface for it
+        # Get the shared surface for it
         for asset in args:
-            self.assets[asset[-1]] = base.ImageSurface(asset)
+            self.assets[asset[-1]] = base.ASSET_CACHE.load_image(asset)
 
     def __getitem__(self, item):
         # Make this class an iterable object
@@ -545,9 +1340,19 @@ class LoadedImages:
 
 
 class AdvancedPlatformScene(base.Scene):
+    # Only moving things need presenting while the camera stands still
+    uses_dirty_rects = True
+
     def __init__(self, director=None, level_config=None):
         super().__init__(director, level_config['name'])
 
+        # Where everything was drawn on screen last frame
+        self._drawn_rects = {}
+        self._drawn_camera = None
+
+        # Objects to take out of the level at the start of the next update, with their layer
+        self.pending_removals = {}
+
         # Level config
         self.level_config = level_config
 
@@ -557,8 +1362,24 @@ class AdvancedPlatformScene(base.Scene):
         # Define the player movement dictionary
         self.player_movement = {'left': False, 'right': False, 'jump': False}
 
+        # Streaming levels only keep the chunks near the player, baked chunks are the same size
+        chunk_size = self.level_config.get('chunk_size', 512) if self.level_config.get('streaming') else None
+
         # Define the level object
-        self.level = Level(self.level_config['file'], self.level_config['width_constant'], self.level_config['object_dict'])
+        self.level = Level(self.level_config['file'], self.level_config['width_constant'], self.level_config['object_dict'], chunk_size=chunk_size)
+
+        # Let the level index the player too
+        self.level.track(self.level_config['player'][1], self.player)
+
+        # Bake static layers, batch physics and register what needs updating
+        self.prepare_level()
+
+        # Load the chunks around the player to start with
+        if self.level.streaming:
+            self.stream_level()
+
+        # Remember how the level starts so it can be reset without rebuilding it
+        self.take_snapshot()
 
         # Define the camera offset object
         self.camera = base.Camera(self, self.level.level_width, self.level.level_height)
@@ -567,8 +1388,12 @@ class AdvancedPlatformScene(base.Scene):
         self.music = self.level_config['music']
 
         # Set the level background
+        # Streaming levels can be any size so they get one the size of the screen that stays put
         if type(self.level_config['background']) is not None:
-            self.background = BackgroundImage((0, 0, self.level.level_width, self.level.level_height), self.level_config['background'], 'cover')
+            if self.level.streaming:
+                self.background = BackgroundImage((0, 0, self.director.screen_width, self.director.screen_height), self.level_config['background'], 'cover')
+            else:
+                self.background = BackgroundImage((0, 0, self.level.level_width, self.level.level_height), self.level_config['background'], 'cover')
 
         self.game_over = False
 
@@ -589,6 +1414,9 @@ class AdvancedPlatformScene(base.Scene):
                     self.player_movement['right'] = False
 
     def on_update(self):
+        # Anything events got rid of goes before it can move or hit anything
+        self.flush_removals()
+
         # If game over the player can't move
         if self.game_over:
             self.player_movement['jump'] = False
@@ -596,13 +1424,49 @@ class AdvancedPlatformScene(base.Scene):
             self.player_movement['right'] = False
 
         # Handle player movement first
-        self.player.handle_movement(self.level[1], self.player_movement)
+        # Colliding against the grid only checks the walls around the player
+        self.player.handle_movement(self.get_collision_objects(), self.player_movement)
+        self.level.grids[self.level_config['player'][1]].update(self.player)
 
-        # For each object in the physical layer level
-        # Call its on_update function
-        for layer_number, level_layer in self.level.layers.items():
-            for level_object in level_layer:
-                level_object.on_update(self.level[1])
+        # Load the chunks the player is coming up to and drop the ones left behind
+        if self.level.streaming:
+            self.stream_level()
+
+        # Only things within the activation radius of the player get updated
+        activation_radius = self.level_config.get('activation_radius', 800)
+        activation_rect = self.player.rect.inflate(activation_radius * 2, activation_radius * 2)
+
+        # Everything updated this frame
+        awake_objects = set()
+
+        # The batch moves against the tile grid, which goes away if something off the grid gets added
+        if self.physics_batch is not None and self.get_collision_objects() is not self.level.tiles:
+            self.dissolve_physics_batch()
+
+        # The batched layer moves all at once
+        if self.physics_batch is not None:
+            self.physics_batch.on_update(self.level.tiles, activation_rect)
+
+        # Only the objects that actually do something each frame get their on_update called
+        for level_object in self.update_objects.query(activation_rect):
+            # Wake up anything the player just came near
+            if getattr(level_object, 'sim_state', 0) == 2:
+                level_object.sim_state = 0
+
+            level_object.on_update(self.get_collision_objects())
+
+            # Keep the grids up to date if it moved
+            self.update_objects.update(level_object)
+            self.level.grids[self.update_layers[level_object]].update(level_object)
+
+            awake_objects.add(level_object)
+
+        # Anything the player left behind goes to sleep
+        for level_object in self.awake_objects - awake_objects:
+            if hasattr(level_object, 'sim_state'):
+                level_object.sim_state = 2
+
+        self.awake_objects = awake_objects
 
         # Update the camera offset to the position
         # of the player before drawing the objects
@@ -610,16 +1474,315 @@ class AdvancedPlatformScene(base.Scene):
 
     def on_draw(self, screen):
         # Draw the background first
-        self.background.draw(screen, self.camera.apply(self.background))
+        if self.level.streaming:
+            self.background.draw(screen)
+        else:
+            self.background.draw(screen, self.camera.apply(self.background))
+
+        # Where everything ends up on screen this frame
+        drawn_rects = {}
+
+        # Chunks that were rebaked this frame
+        rebaked_rects = []
+
+        # The part of the level on screen and the camera offset
+        draw_rect = self.camera.view_rect(self.level_config['width_constant'])
+        offset_x, offset_y = self.camera.state.topleft
 
         # For each object in the physical level layer
         # Call its draw function
         for layer_number, level_layer in self.level.layers.items():
-            for level_object in level_layer:
-                level_object.draw(screen, self.camera.apply(level_object))
+            # Static layers are drawn from their baked chunks
+            if layer_number in self.static_layers:
+                rebaked_rects += self.static_layers[layer_number].draw(screen, self.camera)
+                continue
+
+            # Only what's on screen, with a bit extra for things straddling the edge
+            for level_object in self.level.query(layer_number, draw_rect):
+                # Plain tuples so we aren't making a rect for every object
+                screen_rect = (level_object.rect.x + offset_x, level_object.rect.y + offset_y, level_object.rect.width, level_object.rect.height)
+                level_object.draw(screen, screen_rect)
+                drawn_rects[level_object] = screen_rect
 
         # Draw the player last
-        self.player.draw(screen, self.camera.apply(self.player))
+        player_rect = self.camera.apply(self.player)
+        self.player.draw(screen, player_rect)
+
+        # If the camera moved then everything on screen moved
+        if self.camera.state.topleft != self._drawn_camera:
+            self.mark_dirty()
+        else:
+            # The player can change its look without moving
+            self.mark_dirty(player_rect)
+
+            for rebaked_rect in rebaked_rects:
+                self.mark_dirty(rebaked_rect)
+
+            # Anything that moved needs its old and new spot presented
+            for level_object, screen_rect in drawn_rects.items():
+                last_rect = self._drawn_rects.get(level_object)
+                if last_rect != screen_rect:
+                    self.mark_dirty(screen_rect)
+                    if last_rect is not None:
+                        self.mark_dirty(last_rect)
+
+            # Anything that disappeared needs its old spot presented
+            for level_object, last_rect in self._drawn_rects.items():
+                if level_object not in drawn_rects:
+                    self.mark_dirty(last_rect)
+
+        # Remember for next frame
+        self._drawn_rects = drawn_rects
+        self._drawn_camera = self.camera.state.topleft
+
+    def prepare_level(self):
+        # Bake the layers that never move
+        self.build_static_layers()
+
+        # Move a whole layer at once if we can
+        self.build_physics_batch()
+
+        # Keep track of what needs its on_update called
+        self.build_update_registry()
+
+        # The objects that got updated last frame
+        self.awake_objects = set()
+
+    def build_static_layers(self):
+        # The layers listed as static in the config get baked into chunks
+        self.static_layers = {}
+
+        for layer_number in self.level_config.get('static_layers', []):
+            self.static_layers[layer_number] = StaticLayer(self.level[layer_number], self.level.level_width, self.level.level_height, self.level_config.get('chunk_size', 512))
+
+    def build_physics_batch(self):
+        # Batching needs numpy and the tile grid
+        self.physics_batch = None
+
+        if self.level_config.get('batch_layer') is not None and numpy is not None and self.get_collision_objects() is self.level.tiles:
+            self.physics_batch = PhysicsBatch(self, self.level[self.level_config['batch_layer']])
+
+    def dissolve_physics_batch(self):
+        # Hand the batched objects back their velocities and let them update themselves like everything else
+        physics_batch = self.physics_batch
+        self.physics_batch = None
+
+        for physics_object in list(physics_batch.objects):
+            physics_batch.remove(physics_object)
+            self.register_update(self.level_config['batch_layer'], physics_object)
+
+    def build_update_registry(self):
+        # Indexed so we can still only update what's near the player
+        self.update_objects = base.SpatialGrid(self.level.width_constant)
+
+        # The layer each registered object is in
+        self.update_layers = {}
+
+        for layer_number, level_layer in self.level.layers.items():
+            for level_object in level_layer:
+                self.register_update(layer_number, level_object)
+
+    def register_update(self, layer_number, level_object):
+        # Static layers don't move and the batch moves its own layer
+        if layer_number in self.static_layers:
+            return
+
+        if self.physics_batch is not None and layer_number == self.level_config.get('batch_layer'):
+            return
+
+        # Bricks and walls don't do anything on update so don't bother calling them
+        if not level_object.wants_update():
+            return
+
+        self.update_objects.insert(level_object)
+        self.update_layers[level_object] = layer_number
+
+    def unregister_update(self, level_object):
+        self.update_objects.remove(level_object)
+        self.update_layers.pop(level_object, None)
+
+    def object_moved(self, level_object):
+        # Called by the physics batch when it moves an object
+        self.level.grids[self.level_config['batch_layer']].update(level_object)
+
+    def get_collision_objects(self):
+        # Grid aligned levels can collide against the tile grid instead
+        if self.level_config.get('collision') == 'tiles' and self.level.tiles is not None:
+            return self.level.tiles
+
+        # Otherwise the merged walls if the level could merge them
+        if self.level.colliders is not None:
+            return self.level.colliders
+
+        return self.level.grids[1]
+
+    def add_object(self, layer_number, level_object):
+        # Put a new object into the level
+        self.level.add(layer_number, level_object)
+
+        # Anything resting nearby might not be supported the same anymore
+        if layer_number in self.level.solid_layers:
+            self.wake_objects(level_object.rect)
+
+        self.index_object(layer_number, level_object)
+
+    def remove_object(self, layer_number, level_object):
+        # Take an object out of the level for good
+        self.remove_objects([(layer_number, level_object)])
+
+    def remove_objects(self, objects):
+        # Take (layer number, object) pairs out of the level in one go
+        self.level.remove_objects(objects)
+
+        for layer_number, level_object in objects:
+            # Anything resting on it has to fall now
+            if layer_number in self.level.solid_layers:
+                self.wake_objects(level_object.rect)
+
+            self.unindex_object(layer_number, level_object)
+
+    def queue_removal(self, layer_number, level_object):
+        # Removes the object at the start of the next update
+        # Safe while looping over a layer and queueing the same object twice doesn't matter
+        self.pending_removals[level_object] = layer_number
+
+    def flush_removals(self):
+        if len(self.pending_removals) == 0:
+            return
+
+        # Skip anything that went some other way in the meantime, like its chunk unloading
+        objects = [(layer_number, level_object) for level_object, layer_number in self.pending_removals.items() if level_object in self.level.grids[layer_number]]
+        self.pending_removals = {}
+
+        self.remove_objects(objects)
+
+    def index_object(self, layer_number, level_object):
+        # Hook an object that's in the level up to drawing, physics and updates
+        if layer_number in self.static_layers:
+            self.static_layers[layer_number].add(level_object)
+
+        if self.physics_batch is not None and layer_number == self.level_config.get('batch_layer'):
+            self.physics_batch.add(level_object)
+
+        self.register_update(layer_number, level_object)
+
+    def unindex_object(self, layer_number, level_object):
+        self.awake_objects.discard(level_object)
+
+        if layer_number in self.static_layers:
+            self.static_layers[layer_number].remove(level_object)
+
+        if self.physics_batch is not None and layer_number == self.level_config.get('batch_layer'):
+            self.physics_batch.remove(level_object)
+
+        self.unregister_update(level_object)
+
+    def get_stream_rect(self):
+        # Everything that can get updated or seen has to be loaded
+        stream_radius = self.level_config.get('stream_radius', self.level_config.get('activation_radius', 800) + self.level.chunk_size)
+        return self.player.rect.inflate(stream_radius * 2, stream_radius * 2)
+
+    def stream_level(self):
+        load_keys, unload_keys = self.level.get_chunk_changes(self.get_stream_rect())
+
+        # Unhook what's leaving first so the batch hands back its velocities before it's saved
+        if len(unload_keys) > 0:
+            leaving = self.level.unload_chunks(unload_keys)
+
+            for layer_number, level_object in leaving:
+                self.unindex_object(layer_number, level_object)
+
+            self.level.forget_objects(leaving)
+
+        for key in load_keys:
+            for layer_number, level_object in self.level.load_chunk(key):
+                self.index_object(layer_number, level_object)
+
+    def wake_objects(self, rect):
+        # Get resting objects around the rect moving again
+        wake_rect = pygame.Rect(rect).inflate(self.level.width_constant * 2, self.level.width_constant * 2)
+
+        for layer_number, level_grid in self.level.grids.items():
+            for level_object in level_grid.query(wake_rect):
+                if getattr(level_object, 'sim_state', 0) == 1:
+                    level_object.sim_state = 0
+
+                if self.physics_batch is not None:
+                    self.physics_batch.wake(level_object)
+
+    def take_snapshot(self):
+        # What's in each layer, static ones included in case something gets removed from them
+        self.snapshot_layers = {}
+
+        # [layer, object, state] for everything that can move
+        self.snapshot_objects = [[self.level_config['player'][1], self.player, get_object_state(self.player)]]
+
+        # Streaming levels start again from the level file so only the player needs remembering
+        if self.level.streaming:
+            return
+
+        # The batched objects only have their velocities in the batch
+        if self.physics_batch is not None:
+            self.physics_batch.sync_objects()
+
+        for layer_number, level_layer in self.level.layers.items():
+            self.snapshot_layers[layer_number] = list(level_layer)
+
+            # Static layers never move so there's no state to keep
+            if layer_number in self.static_layers:
+                continue
+
+            for level_object in level_layer:
+                self.snapshot_objects.append([layer_number, level_object, get_object_state(level_object)])
+
+    def restore_snapshot(self):
+        # Nothing queued from before the reset should happen after it
+        self.pending_removals = {}
+
+        # Streaming levels throw away their chunks and load them again around the player
+        if self.level.streaming:
+            self.level.reset_chunks()
+            self.prepare_level()
+
+        # Put the level back how it was when it loaded, reusing all the same objects
+        for layer_number, level_objects in self.snapshot_layers.items():
+            alive = set(level_objects)
+
+            # Take out anything added since
+            for level_object in [level_object for level_object in self.level[layer_number] if level_object not in alive]:
+                self.remove_object(layer_number, level_object)
+
+            # Put back anything that got removed
+            current = set(self.level[layer_number])
+            for level_object in level_objects:
+                if level_object not in current:
+                    self.add_object(layer_number, level_object)
+
+            # Same draw order as before
+            self.level.layers[layer_number][:] = level_objects
+
+        for layer_number, level_object, state in self.snapshot_objects:
+            set_object_state(level_object, state)
+
+            # Everything indexing the object has to know where it went
+            self.level.grids[layer_number].update(level_object)
+
+            if level_object in self.update_objects:
+                self.update_objects.update(level_object)
+
+            if self.physics_batch is not None and level_object in self.physics_batch.indices:
+                self.physics_batch.refresh(level_object)
+
+        # Nothing's been updated since the reset
+        self.awake_objects = set()
+
+        if self.level.streaming:
+            self.stream_level()
+
+    def invalidate_static(self, layer_number, rect):
+        # Rebake the chunks under a static object that changed its look
+        if layer_number in self.static_layers:
+            self.static_layers[layer_number].invalidate(rect)
 
     def end_game(self):
         # Game over
@@ -637,11 +1800,10 @@ class AdvancedPlatformScene(base.Scene):
 
         self.player_movement = {'left': False, 'right': False, 'jump': False}
 
-        self.level = Level(self.level_config['file'], self.level_config['width_constant'], self.level_config['object_dict'])
-
-        self.player = self.level_config['player'][0].duplicate()
+        # Put everything back where it started instead of reading the level again
+        self.restore_snapshot()
 
-        self.player.rect.x, self.player.rect.y = self.level_config['player'][0].rect.x, self.level_config['player'][0].rect.y
+        self.player.set_alive()
 
         self.game_over = False
 
@@ -675,12 +1837,21 @@ class LevelConfig:
 
 
 class PhysicsObject(DrawableGameObject):
+    __slots__ = ('grounded', 'delta_x', 'delta_y', 'sim_state')
+
+    shared_surface = True
+
     def __init__(self, scene=None, x=0, y=0, width=32, height=32):
         super().__init__(scene, x, y, width, height)
         self.grounded = False
         self.delta_x = 0
         self.delta_y = 0
 
+        # 0 is active
+        # 1 is resting (on the ground with nothing to chase, skips collisions)
+        # 2 is sleeping (too far from the player, doesn't get updated)
+        self.sim_state = 0
+
     def _update(self):
         # Make enemies green for no reason
         self.surface.fill(base.Colors.GREEN)
@@ -703,6 +1874,14 @@ class PhysicsObject(DrawableGameObject):
         elif player_x > self_x and 350 > diff > 2:
             self.delta_x = 200 * self.scene.director.delta_time
 
+        # If we're resting only the player coming close gets us going again
+        if self.sim_state == 1:
+            if self.delta_x == 0:
+                self.settle()
+                return
+
+            self.sim_state = 0
+
         # If not grounded then apply gravity
         if not self.grounded:
             self.delta_y += 25 * self.scene.director.delta_time
@@ -711,27 +1890,285 @@ class PhysicsObject(DrawableGameObject):
 
         # Standard movement stuff from player
 
+        start_rect = self.rect.copy()
         self.rect.x += int(self.delta_x)
 
-        for wall in collision_objects:
+        if isinstance(collision_objects, TileGrid):
             if self.delta_x != 0:
+                collision_objects.sweep_x(self.rect, self.delta_x)
+        else:
+            for wall in get_colliders(collision_objects, self.rect.union(start_rect)):
+                if self.delta_x != 0:
+                    if self.rect.colliderect(wall.rect) and wall.id != self.id:
+                        if self.delta_x > 0:
+                            self.rect.right = wall.rect.left
+                        elif self.delta_x < 0:
+                            self.rect.left = wall.rect.right
+
+        start_rect = self.rect.copy()
+        self.rect.y += int(self.delta_y)
+
+        if isinstance(collision_objects, TileGrid):
+            if collision_objects.sweep_y(self.rect, self.delta_y):
+                self.grounded = self.delta_y > 0
+                self.delta_y = 0
+        else:
+            for wall in get_colliders(collision_objects, self.rect.union(start_rect)):
                 if self.rect.colliderect(wall.rect) and wall.id != self.id:
-                    if self.delta_x > 0:
-                        self.rect.right = wall.rect.left
-                    elif self.delta_x < 0:
-                        self.rect.left = wall.rect.right
+                    if self.delta_y > 0:
+                        self.rect.bottom = wall.rect.top
+                        self.grounded = True
+                    elif self.delta_y < 0:
+                        self.rect.top = wall.rect.bottom
 
-        self.rect.y += int(self.delta_y)
+                    self.delta_y = 0
 
-        for wall in collision_objects:
-            if self.rect.colliderect(wall.rect) and wall.id != self.id:
-                if self.delta_y > 0:
-                    self.rect.bottom = wall.rect.top
-                    self.grounded = True
-                elif self.delta_y < 0:
-                    self.rect.top = wall.rect.bottom
+        # Standing on something with nothing to chase so have a rest
+        if self.grounded and self.delta_x == 0:
+            self.sim_state = 1
 
-                self.delta_y = 0
+    def settle(self):
+        # Standing still on the floor still ticks gravity and lands again every few frames
+        # Keep that going without any collisions so we wake up exactly how we would have without resting
+        if not self.grounded:
+            self.delta_y += 25 * self.scene.director.delta_time
+
+        # Sinking a whole pixel would put us into the floor we're on and land us again
+        self.grounded = int(self.delta_y) > 0
+        if self.grounded:
+            self.delta_y = 0
+
+
+# /===================================/
+#  Physics batch class
+#  Keeps a whole layer of physics objects (enemies) in arrays
+#  And moves them all at once with the same rules as PhysicsObject.on_update
+#  The objects stay around as handles for drawing, queries and removal
+# /===================================/
+
+
+class PhysicsBatch:
+    def __init__(self, scene, objects):
+        if numpy is None:
+            raise Exception('PhysicsBatch needs numpy')
+
+        self.scene = scene
+
+        # The objects in the same order as the arrays
+        self.objects = []
+
+        # Where each object is in the arrays
+        self.indices = {}
+
+        # One entry per object, only the first len(objects) are in use
+        self.x = numpy.zeros(0, dtype=numpy.int64)
+        self.y = numpy.zeros(0, dtype=numpy.int64)
+        self.width = numpy.zeros(0, dtype=numpy.int64)
+        self.height = numpy.zeros(0, dtype=numpy.int64)
+        self.delta_x = numpy.zeros(0, dtype=numpy.float64)
+        self.delta_y = numpy.zeros(0, dtype=numpy.float64)
+        self.grounded = numpy.zeros(0, dtype=bool)
+        self.sim_state = numpy.zeros(0, dtype=numpy.int8)
+
+        for physics_object in objects:
+            self.add(physics_object)
+
+    def _arrays(self):
+        return ['x', 'y', 'width', 'height', 'delta_x', 'delta_y', 'grounded', 'sim_state']
+
+    def add(self, physics_object):
+        index = len(self.objects)
+
+        # Grow the arrays when they're full
+        if index == len(self.x):
+            for name in self._arrays():
+                old = getattr(self, name)
+                new = numpy.zeros(max(16, len(old) * 2), dtype=old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+
+        self.objects.append(physics_object)
+        self.indices[physics_object] = index
+        self.refresh(physics_object)
+
+    def remove(self, physics_object):
+        index = self.indices.pop(physics_object, None)
+        if index is None:
+            return
+
+        # It's leaving so it needs its velocities back
+        physics_object.delta_x = float(self.delta_x[index])
+        physics_object.delta_y = float(self.delta_y[index])
+        physics_object.grounded = bool(self.grounded[index])
+        physics_object.sim_state = int(self.sim_state[index])
+
+        # Move the last object into the gap so removal doesn't shift everything
+        last = len(self.objects) - 1
+        if index != last:
+            moved_object = self.objects[last]
+            self.objects[index] = moved_object
+            self.indices[moved_object] = index
+
+            for name in self._arrays():
+                array_values = getattr(self, name)
+                array_values[index] = array_values[last]
+
+        self.objects.pop()
+
+    def refresh(self, physics_object):
+        # Copy an object's state into the arrays, call if something moved it directly
+        index = self.indices[physics_object]
+        self.x[index] = physics_object.rect.x
+        self.y[index] = physics_object.rect.y
+        self.width[index] = physics_object.rect.width
+        self.height[index] = physics_object.rect.height
+        self.delta_x[index] = physics_object.delta_x
+        self.delta_y[index] = physics_object.delta_y
+        self.grounded[index] = physics_object.grounded
+        self.sim_state[index] = physics_object.sim_state
+
+    def wake(self, physics_object):
+        # Something disturbed a resting object
+        index = self.indices.get(physics_object)
+        if index is not None and self.sim_state[index] == 1:
+            self.sim_state[index] = 0
+
+    def sync_objects(self):
+        # Copy the velocities back into the objects, call it before reading them off the objects
+        # Positions are always kept in step and anything removed gets its own back
+        for index, physics_object in enumerate(self.objects):
+            physics_object.delta_x = float(self.delta_x[index])
+            physics_object.delta_y = float(self.delta_y[index])
+            physics_object.grounded = bool(self.grounded[index])
+            physics_object.sim_state = int(self.sim_state[index])
+
+    def _solid(self, occupancy, tiles, columns, rows):
+        # Nothing outside the level
+        inside = (columns >= 0) & (columns < tiles.columns) & (rows >= 0) & (rows < tiles.rows)
+        return inside & (occupancy[numpy.clip(rows, 0, tiles.rows - 1), numpy.clip(columns, 0, tiles.columns - 1)] == 1)
+
+    def _solid_lines(self, occupancy, tiles, first, last, other_first, other_last, rows):
+        # For each object, the first and last line between first and last with a solid tile
+        # Lines are rows if rows is True, otherwise columns
+        count = len(first)
+        hit_any = numpy.zeros(count, dtype=bool)
+        lowest = numpy.zeros(count, dtype=numpy.int64)
+        highest = numpy.zeros(count, dtype=numpy.int64)
+
+        if count == 0:
+            return hit_any, lowest, highest
+
+        # Objects are rarely more than a couple of tiles big so loop over the offsets
+        for line_offset in range(int((last - first).max()) + 1):
+            line = first + line_offset
+            hit = numpy.zeros(count, dtype=bool)
+
+            for other_offset in range(int((other_last - other_first).max()) + 1):
+                other = other_first + other_offset
+
+                if rows:
+                    hit |= (other <= other_last) & self._solid(occupancy, tiles, other, line)
+                else:
+                    hit |= (other <= other_last) & self._solid(occupancy, tiles, line, other)
+
+            hit &= line <= last
+
+            lowest = numpy.where(hit & ~hit_any, line, lowest)
+            highest = numpy.where(hit, line, highest)
+            hit_any |= hit
+
+        return hit_any, lowest, highest
+
+    def on_update(self, tiles, update_rect=None):
+        count = len(self.objects)
+        if count == 0:
+            return
+
+        # Synatic sugar
+        delta_time = self.scene.director.delta_time
+        size = tiles.tile_size
+        occupancy = numpy.frombuffer(tiles.cells, dtype=numpy.uint8).reshape(tiles.rows, tiles.columns)
+
+        x = self.x[:count]
+        y = self.y[:count]
+        width = self.width[:count]
+        height = self.height[:count]
+        delta_x = self.delta_x[:count]
+        delta_y = self.delta_y[:count]
+        grounded = self.grounded[:count]
+        sim_state = self.sim_state[:count]
+
+        # Objects touching the update rect are awake, the rest go to sleep
+        if update_rect is None:
+            awake = numpy.ones(count, dtype=bool)
+        else:
+            awake = (x < update_rect.right) & (x + width > update_rect.left) & (y < update_rect.bottom) & (y + height > update_rect.top)
+
+        sim_state[awake & (sim_state == 2)] = 0
+        sim_state[~awake] = 2
+
+        old_x = x.copy()
+        old_y = y.copy()
+
+        # Chase the player if they're less than 350 units away but more than 2
+        player_x = self.scene.player.rect.x
+        diff = numpy.abs(player_x - x)
+        chasing = (diff < 350) & (diff > 2)
+        delta_x[awake] = 0
+        delta_x[awake & chasing & (player_x < x)] = -200 * delta_time
+        delta_x[awake & chasing & (player_x > x)] = 200 * delta_time
+
+        # Resting objects only get going again if there's something to chase
+        sim_state[(sim_state == 1) & (delta_x != 0)] = 0
+
+        # The rest keep ticking gravity against the floor they're on without any collisions, like PhysicsObject.settle
+        resting = awake & (sim_state == 1)
+        delta_y[resting & ~grounded] += 25 * delta_time
+
+        landing = resting & (numpy.trunc(delta_y) > 0)
+        grounded[resting] = False
+        grounded[landing] = True
+        delta_y[landing] = 0
+
+        # Only active objects actually move
+        active = awake & (sim_state == 0)
+
+        # If not grounded then apply gravity
+        falling = active & ~grounded
+        delta_y[falling] += 25 * delta_time
+
+        grounded[active] = False
+
+        # Move on the x axis and push back out of any solid tiles
+        x[active] += numpy.trunc(delta_x[active]).astype(numpy.int64)
+
+        hit, lowest, highest = self._solid_lines(occupancy, tiles, x // size, (x + width - 1) // size, y // size, (y + height - 1) // size, False)
+        right = active & hit & (delta_x > 0)
+        left = active & hit & (delta_x < 0)
+        x[right] = lowest[right] * size - width[right]
+        x[left] = (highest[left] + 1) * size
+
+        # Move on the y axis and land on or bump into any solid tiles
+        y[active] += numpy.trunc(delta_y[active]).astype(numpy.int64)
+
+        hit, lowest, highest = self._solid_lines(occupancy, tiles, y // size, (y + height - 1) // size, x // size, (x + width - 1) // size, True)
+        down = active & hit & (delta_y > 0)
+        up = active & hit & (delta_y < 0)
+        y[down] = lowest[down] * size - height[down]
+        y[up] = (highest[up] + 1) * size
+        grounded[down] = True
+        delta_y[active & hit] = 0
+
+        # Standing on something with nothing to chase so have a rest
+        sim_state[active & grounded & (delta_x == 0)] = 1
+
+        # Only the objects that actually moved need their rects touched
+        for index in numpy.nonzero((x != old_x) | (y != old_y))[0]:
+            physics_object = self.objects[index]
+            physics_object.rect.x = int(x[index])
+            physics_object.rect.y = int(y[index])
+
+            self.scene.object_moved(physics_object)
 
 
 # /===================================/
@@ -740,7 +2177,35 @@ class PhysicsObject(DrawableGameObject):
 
 
 class DynamicText(base.Text):
+    def __init__(self, rect=None, caption=None, font=base.DEFAULT_FONT, font_color=base.Colors.WHITE, centered=True, glyphs=None):
+        # Characters to draw from a glyph atlas instead of rendering the font every change
+        # Captions with anything else in them still get rendered normally
+        self._atlas = None if glyphs is None else base.get_glyph_atlas(font, font_color, glyphs)
+
+        super().__init__(rect, caption, font, font_color, centered)
+
+    def _update(self):
+        if self._atlas is None or not self._atlas.can_render(self._caption):
+            super()._update()
+            return
+
+        # Same as the normal text but put together from the atlas
+        caption_rect = pygame.Rect((0, 0), self._atlas.size(self._caption))
+
+        # Center text
+        if self._centered:
+            caption_rect.center = int(self.rect.width / 2), int(self.rect.height / 2)
+
+        # Reset the text surface
+        self.surface.fill((0, 0, 0, 0))
+
+        self._atlas.draw(self.surface, self._caption, caption_rect.topleft)
+
     def update_text(self, text):
+        # Nothing to do if it says the same thing
+        if str(text) == self._caption:
+            return
+
         self._caption = str(text)
         self._update()
 
@@ -776,7 +2241,7 @@ class Animation:
 
             # If the frame is a file reference load its image
             if type(frame[0]) == list:
-                frame = (pygame.image.load(os.path.join(*frame[0])).convert_alpha(), frame[1])
+                frame = (base.ASSET_CACHE.load_image(frame[0], alpha=True), frame[1])
             elif frame[0] is None:
                 frame = (pygame.Surface((0, 0)), frame[1])
 
@@ -933,6 +2398,11 @@ class Animation:
 
 
 class EndBlock(DrawableGameObject):
+    __slots__ = ()
+
+    # Never drawn so they might as well all share one
+    shared_surface = True
+
     def __init__(self, scene=None, x=0, y=0, width=100, height=100):
         super().__init__(scene, x, y, width, height)
 
@@ -953,8 +2423,13 @@ class EndBlock(DrawableGameObject):
 
 class BackgroundMusic(pygame.mixer.Sound):
     def __init__(self, file):
-        # Load file
-        super().__init__(os.path.join(*file))
+        # Use the samples if they were preloaded, otherwise load the file
+        samples = base.ASSET_CACHE.load_sound(file)
+
+        if samples is None:
+            super().__init__(os.path.join(*file))
+        else:
+            super().__init__(buffer=samples)
 
     def play_and_loop(self):
         # Play and loop
@@ -29,6 +29,9 @@ class MainMenu(extended.MenuScene):
 
 
 class SplashScreen(base.Scene):
+    # Nothing changes once the fade is done
+    uses_dirty_rects = True
+
     def __init__(self, director=None):
         # Ease
         text_width = 500
@@ -47,6 +50,9 @@ class SplashScreen(base.Scene):
         self.fade_in_stuff = base.ColorSurface((director.screen.get_rect().width, director.screen.get_rect().height), base.Colors.BLACK)
         self.alpha = 255
 
+        # The fade as of the last draw
+        self.drawn_alpha = None
+
     def on_event(self, events):
         for event in events:
             # Who wants splash screens? :(
@@ -63,13 +69,32 @@ class SplashScreen(base.Scene):
         if self.director.scene_elapsed_time >= 6000:
             self.director.handle_command(['load_scene', 'MainMenu'])
 
+    def is_idle(self):
+        # Once the fade is done nothing happens until a key or the timeout
+        return self.alpha <= 0
+
+    def get_wakeup_time(self):
+        return 6000 - self.director.scene_elapsed_time
+
     def on_draw(self, screen):
+        # Don't bother if the fade hasn't moved
+        if self.fade_in_stuff.get_alpha() == self.drawn_alpha and not self.full_redraw:
+            return
+
+        self.drawn_alpha = self.fade_in_stuff.get_alpha()
+
         screen.fill(base.Colors.BLACK)
         self.developer_name.draw(screen)
         screen.blit(self.fade_in_stuff, self.fade_in_stuff.get_rect())
 
+        # The fade covers the whole screen
+        self.mark_dirty()
+
 
 class GameScene(extended.AdvancedPlatformScene):
+    # Set by each level
+    level_file = None
+
     def __init__(self, director=None, level=None, name=None):
         text_width = 700
         text_height = 150
@@ -111,6 +136,9 @@ class GameScene(extended.AdvancedPlatformScene):
                 'A': [extended.EndBlock(self, 0, 0, 32, 32), 0]
             },
             'width_constant': 32,
+            'static_layers': [1],
+            'collision': 'tiles',
+            'batch_layer': 2,
             'background': ['assets', 'images', 'clouds.pcx'],
             'name': name,
             'music': extended.BackgroundMusic(['assets', 'sounds', 'background.wav']),
@@ -133,14 +161,13 @@ class GameScene(extended.AdvancedPlatformScene):
         super().__init__(director, level_config)
 
         # Da lives text
-        self.lives_text = extended.DynamicText((director.screen_width - 88, 33, 50, 50), 'Lives', base.DEFAULT_FONT, base.Colors.WHITE)
+        self.lives_text = extended.DynamicText((director.screen_width - 88, 33, 50, 50), 'Lives', base.DEFAULT_FONT, base.Colors.WHITE, glyphs='0123456789')
 
         # Da timer text
-        self.timer = extended.DynamicText((20, 20, 50, 50), '0', base.DEFAULT_FONT, base.Colors.WHITE)
+        self.timer = extended.DynamicText((20, 20, 50, 50), '0', base.DEFAULT_FONT, base.Colors.WHITE, glyphs='0123456789')
 
         # Da lives text love heart background
-        self.life_counter = base.ImageSurface(['assets', 'images', 'heart.pcx'], (85, 85))
-        self.life_counter.set_colorkey((255, 255, 255), pygame.RLEACCEL)
+        self.life_counter = base.ASSET_CACHE.load_image(['assets', 'images', 'heart.pcx'], (85, 85), colorkey=(255, 255, 255))
 
         # Da lazy fade in copy paste
         self.fade_in_stuff = base.ColorSurface((director.screen.get_rect().width, director.screen.get_rect().height), base.Colors.BLACK)
@@ -149,6 +176,17 @@ class GameScene(extended.AdvancedPlatformScene):
         self.fade_in_stuff.set_alpha(0)
         self.alpha = 0
 
+    @classmethod
+    def preload_tasks(cls):
+        # Everything that comes off the disk when the level gets built
+        return [
+            lambda: extended.load_level_file(cls.level_file),
+            lambda: base.ASSET_CACHE.preload_image(['assets', 'images', 'bricks.pcx']),
+            lambda: base.ASSET_CACHE.preload_image(['assets', 'images', 'heart.pcx']),
+            lambda: base.ASSET_CACHE.preload_image(['assets', 'images', 'clouds.pcx']),
+            lambda: base.ASSET_CACHE.preload_sound(['assets', 'sounds', 'background.wav'])
+        ]
+
     def on_event(self, events):
         # Call the superclass on_event
         super().on_event(events)
@@ -156,11 +194,13 @@ class GameScene(extended.AdvancedPlatformScene):
         for event in events:
             # Kill the enemies if we mouse over them
             if event.type == pygame.MOUSEMOTION:
-                for enemy in self.level[2]:
-                    # Weird stuff with calling on_event before on_draw with the offsets and stuff
-                    if self.camera.apply(enemy).collidepoint(event.pos):
-                        # Rip enemy
-                        self.level[2].remove(enemy)
+                # Weird stuff with calling on_event before on_draw with the offsets and stuff
+                cursor_rect = pygame.Rect(self.camera.to_world(event.pos), (1, 1))
+
+                # Only the enemies right under the cursor
+                for enemy in self.level.query(2, cursor_rect):
+                    # Rip enemy
+                    self.queue_removal(2, enemy)
             # Skip 6 second end game screen
             elif self.game_over and event.type == pygame.KEYDOWN:
                 self.director.handle_command(['load_scene', 'LevelSelect'])
@@ -169,8 +209,8 @@ class GameScene(extended.AdvancedPlatformScene):
         # Call the superclass on_update
         super().on_update()
 
-        # For each enemy
-        for enemy in self.level[2]:
+        # For each enemy touching the player
+        for enemy in self.level.query(2, self.player.rect):
             # Is it colliding with the player and not invulnerable?
             if enemy.rect.colliderect(self.player.rect) and self.director.scene_elapsed_time > self.player_runtime['player_reborn_time']:
                 # If we ded den end da game
@@ -187,7 +227,7 @@ class GameScene(extended.AdvancedPlatformScene):
                 pass
 
         # If we hit da end of da level end da game
-        for end_block in self.level[0]:
+        for end_block in self.level.query(0, self.player.rect):
             if end_block.rect.colliderect(self.player.rect) and not self.game_over:
                 self.end_game()
 
@@ -221,6 +261,15 @@ class GameScene(extended.AdvancedPlatformScene):
 
         screen.blit(self.fade_in_stuff, (0, 0))
 
+        # The HUD sits on top of the level so always present it
+        self.mark_dirty((self.director.screen_width - 105, 20, 85, 85))
+        self.mark_dirty(self.lives_text.rect)
+        self.mark_dirty(self.timer.rect)
+
+        # The game over fade covers the whole screen
+        if self.game_over:
+            self.mark_dirty()
+
     def on_exit(self):
         super().on_exit()
 
@@ -238,18 +287,24 @@ class GameScene(extended.AdvancedPlatformScene):
 
 
 class FirstLevel(GameScene):
+    level_file = ['data', 'levels', 'level_1.txt']
+
     def __init__(self, director=None):
-        super().__init__(director, ['data', 'levels', 'level_1.txt'], 'FirstLevel')
+        super().__init__(director, self.level_file, 'FirstLevel')
 
 
 class SecondLevel(GameScene):
+    level_file = ['data', 'levels', 'level_2.txt']
+
     def __init__(self, director=None):
-        super().__init__(director, ['data', 'levels', 'level_2.txt'], 'SecondLevel')
+        super().__init__(director, self.level_file, 'SecondLevel')
 
 
 class ThirdLevel(GameScene):
+    level_file = ['data', 'levels', 'level_3.txt']
+
     def __init__(self, director=None):
-        super().__init__(director, ['data', 'levels', 'level_3.txt'], 'ThirdLevel')
+        super().__init__(director, self.level_file, 'ThirdLevel')
 
 
 class LevelSelect(extended.MenuScene):
@@ -262,9 +317,9 @@ class LevelSelect(extended.MenuScene):
 
         # Initialize
         background = extended.BackgroundImage((0, 0, director.screen_width, director.screen_height), ['assets', 'images', 'clouds.pcx'], 'cover')
-        play_button = extended.MainMenuButton(self, {'click': ['load_scene', 'FirstLevel']}, (w_center, h_center - 150, button_width, button_height), 'Level 1')
-        options_button = extended.MainMenuButton(self, {'click': ['load_scene', 'SecondLevel']}, (w_center, h_center, button_width, button_height), 'Level 2')
-        quit_button = extended.MainMenuButton(self, {'click': ['load_scene', 'ThirdLevel']}, (w_center, h_center + 150, button_width, button_height), 'Level 3')
+        play_button = extended.MainMenuButton(self, {'click': ['load_scene_async', 'FirstLevel']}, (w_center, h_center - 150, button_width, button_height), 'Level 1')
+        options_button = extended.MainMenuButton(self, {'click': ['load_scene_async', 'SecondLevel']}, (w_center, h_center, button_width, button_height), 'Level 2')
+        quit_button = extended.MainMenuButton(self, {'click': ['load_scene_async', 'ThirdLevel']}, (w_center, h_center + 150, button_width, button_height), 'Level 3')
         back_button = extended.MainMenuButton(self, {'click': ['load_scene', 'MainMenu']}, (20, director.screen_height - 120, 120, button_height), 'Back')
 
         buttons = [play_button, options_button, quit_button, back_button]
@@ -275,8 +330,65 @@ class LevelSelect(extended.MenuScene):
 
         super().__init__(director, name, buttons, background, music)
 
+    def on_load(self):
+        super().on_load()
+
+        # Read the levels while the player is picking one
+        self.director.prefetch(['FirstLevel', 'SecondLevel', 'ThirdLevel'])
+
+
+class LoadingScene(extended.MenuScene):
+    # Shown while a level's files are read on the worker thread
+    def __init__(self, director=None):
+        bar_width = 400
+        bar_height = 40
+        w_center, h_center = utility.center_rect(bar_width, bar_height, director.screen_width, director.screen_height)
+
+        background = extended.BackgroundImage((0, 0, director.screen_width, director.screen_height), ['assets', 'images', 'clouds.pcx'], 'cover')
+        back_button = extended.MainMenuButton(self, {'click': ['cancel_loading']}, (20, director.screen_height - 120, 120, 100), 'Back')
+
+        # Loading text and the progress bar under it
+        self.loading_text = base.Text((w_center, h_center - 120, bar_width, 100), 'Loading...', base.DEFAULT_FONT, base.Colors.WHITE)
+        self.progress_rect = pygame.Rect(w_center, h_center, bar_width, bar_height)
+
+        # Progress as of the last draw
+        self.drawn_progress = None
+
+        super().__init__(director, 'Loading', [back_button], background, None, [self.loading_text])
 
-class HelpScene(base.Scene):
+    def on_event(self, events):
+        super().on_event(events)
+
+        # Backspace backs out too
+        for event in events:
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_BACKSPACE:
+                self.director.handle_command(['cancel_loading'])
+
+    def get_wakeup_time(self):
+        # Check on the worker a few times a second to move the bar and swap scenes when it's done
+        return 50
+
+    def on_draw(self, screen):
+        # Draws the background and text, then any buttons that changed
+        super().on_draw(screen)
+
+        progress = self.director.loading_progress()
+
+        if not self.full_redraw:
+            if progress == self.drawn_progress:
+                return
+
+            self.mark_dirty(self.progress_rect)
+
+        self.drawn_progress = progress
+
+        # Empty bar then fill it up to the progress
+        pygame.draw.rect(screen, base.Colors.BLACK, self.progress_rect)
+        pygame.draw.rect(screen, base.Colors.WHITE, (self.progress_rect.x, self.progress_rect.y, int(self.progress_rect.width * progress), self.progress_rect.height))
+        pygame.draw.rect(screen, base.Colors.WHITE, self.progress_rect, 4)
+
+
+class HelpScene(extended.MenuScene):
     # Main meny copy because I was lazy again
     def __init__(self, director=None):
         button_width = director.screen_width
@@ -297,22 +409,9 @@ class HelpScene(base.Scene):
 
         self.back_button = extended.MainMenuButton(self, {'click': ['load_scene', 'MainMenu']}, (20, director.screen_height - 120, 120, button_height), 'Back')
 
-        name = 'HelpScene'
-
-        super().__init__(director, name)
-
-    def on_event(self, events):
-        # You don't want to get stuck in this scene do you?
-        for event in events:
-            self.back_button.handle_event(event)
-
-    def on_update(self):
-        # Stuff raise exception I'm too lazy to delete it
-        pass
+        # The text never changes so it goes in the static frame with the black background
+        static_elements = [self.help_text_1, self.help_text_2, self.help_text_3]
 
-    def on_draw(self, screen):
-        self.help_text_1.draw(screen)
-        self.help_text_2.draw(screen)
-        self.help_text_3.draw(screen)
+        name = 'HelpScene'
 
-        self.back_button.draw(screen)
+        super().__init__(director, name, [self.back_button], None, None, static_elements)
@@ -0,0 +1,45 @@
+import os
+import sys
+
+# No window or sound card needed
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# The game loads its fonts and assets relative to the repo root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+import pygame
+import pytest
+
+pygame.init()
+
+from gamelib import base, extended
+
+
+class FakeClock:
+    # Every frame takes exactly 16ms so tests don't wait around
+    def tick(self, *args):
+        return 16
+
+    def get_fps(self):
+        return 60.0
+
+
+class SilentMusic(extended.BackgroundMusic):
+    # The level music isn't in the repo
+    def __init__(self, file):
+        pygame.mixer.Sound.__init__(self, buffer=bytes(4410))
+
+
+@pytest.fixture
+def director(monkeypatch):
+    monkeypatch.setattr(extended, 'BackgroundMusic', SilentMusic)
+
+    test_director = base.Director('Test')
+    test_director.clock = FakeClock()
+
+    yield test_director
+
+    test_director.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,152 @@
+import time
+import pygame
+import pytest
+import scenes
+from concurrent import futures
+from gamelib import base
+
+
+def hold_key(director, key, frames):
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0))
+
+    for frame in range(frames):
+        director.run_frame()
+
+    pygame.event.post(pygame.event.Event(pygame.KEYUP, key=key, mod=0, unicode='', scancode=0))
+
+
+def test_dirty_rects_stay_bounded_without_dirty_presenting(director):
+    # The default director redraws the whole screen, nothing else ever empties the dirty rects
+    director.add_scenes([('FirstLevel', scenes.FirstLevel)])
+    director.load_scene('FirstLevel')
+
+    hold_key(director, pygame.K_d, 150)
+    hold_key(director, pygame.K_a, 150)
+
+    assert len(director.active_scene.dirty_rects) < 50
+
+
+def test_quitting_drops_queued_preloads(director, monkeypatch):
+    # Keep pygame going for the other tests
+    monkeypatch.setattr(pygame, 'quit', lambda: None)
+
+    ran = []
+
+    def slow_task(number):
+        time.sleep(0.2)
+        ran.append(number)
+
+    tasks = [director.executor.submit(slow_task, number) for number in range(5)]
+
+    director.quit()
+
+    start = time.time()
+    with pytest.raises(SystemExit):
+        director.loop()
+
+    # Only the task that was already running gets finished, the rest never run
+    assert time.time() - start < 0.5
+    assert sum(task.cancelled() for task in tasks) >= 4
+    assert all(task.done() for task in tasks)
+    assert len(ran) <= 1
+
+
+def make_scene(scene_name, delay):
+    # A scene that takes a while to prefetch
+    class SlowScene(base.Scene):
+        def __init__(self, director=None):
+            super().__init__(director, scene_name)
+
+        @classmethod
+        def preload_tasks(cls):
+            return [lambda: time.sleep(delay), lambda: time.sleep(delay)]
+
+        def on_event(self, events):
+            pass
+
+        def on_update(self):
+            pass
+
+        def on_draw(self, screen):
+            pass
+
+    return SlowScene
+
+
+def test_picked_scene_skips_ahead_of_other_prefetches(director):
+    director.loading_scene = 'Loading'
+    director.add_scenes([(name, make_scene(name, 0.1)) for name in ('Loading', 'First', 'Second', 'Third')])
+    director.load_scene('Loading')
+
+    director.prefetch(['First', 'Second', 'Third'])
+    first_tasks = director.prefetching['First']
+    second_tasks = director.prefetching['Second']
+
+    director.load_scene_async('Third')
+
+    # Only what was already running is left of the others
+    assert 'Second' not in director.prefetching
+    assert all(task.cancelled() for task in second_tasks)
+    assert sum(task.cancelled() for task in first_tasks) >= 1
+
+    # So the picked scene is ready after about one task instead of all of them
+    start = time.time()
+    futures.wait(director.loading[2], timeout=2)
+    assert time.time() - start < 0.45
+
+    director.update_loading()
+    assert director.active_scene.name == 'Third'
+
+
+class LongWaitClock:
+    # Every frame takes 20 seconds, like sitting on a menu for a while
+    def tick(self, *args):
+        return 20000
+
+    def get_fps(self):
+        return 0.05
+
+
+class IdleMenu(base.Scene):
+    # Waits for any key then loads the first level
+    def __init__(self, director=None):
+        super().__init__(director, 'IdleMenu')
+
+    def is_idle(self):
+        return True
+
+    def on_event(self, events):
+        for event in events:
+            if event.type == pygame.KEYDOWN:
+                self.director.load_scene('FirstLevel')
+
+    def on_update(self):
+        pass
+
+    def on_draw(self, screen):
+        pass
+
+
+def test_long_idle_wait_doesnt_leak_into_the_next_scene(director):
+    director.add_scenes([('IdleMenu', IdleMenu), ('FirstLevel', scenes.FirstLevel)])
+    director.load_scene('IdleMenu')
+    director.run_frame()
+
+    director.clock = LongWaitClock()
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE, mod=0, unicode=' ', scancode=0))
+    director.run_frame()
+
+    # The level got its first update in the same frame as the long wait
+    level = director.active_scene.level
+    level_rect = pygame.Rect(0, 0, level.level_width, level.level_height)
+
+    assert director.active_scene.name == 'FirstLevel'
+    assert director.delta_time <= 1 / 60
+    assert all(level_rect.contains(enemy.rect) for enemy in level[2])
+
+    # Long frames after that are capped too, but timers still go by the real time
+    director.run_frame()
+
+    assert director.delta_time == director.max_delta_time
+    assert director.scene_elapsed_time == 20000
+    assert all(level_rect.contains(enemy.rect) for enemy in level[2])
@@ -0,0 +1,132 @@
+import random
+import pygame
+import pytest
+from gamelib import ecs, extended
+
+
+def check_locations(world):
+    # Every entity's location points at a row that really holds it
+    for entity, (archetype, row) in world.locations.items():
+        assert archetype.entities[row] == entity
+
+    assert sum(len(archetype) for archetype in world.archetypes.values()) == len(world)
+
+
+def test_destroy_keeps_locations_in_step():
+    world = ecs.World()
+    entities = [world.create({'position': (index, index * 2), 'layer': (index,)}) for index in range(8)]
+
+    # First, middle and last so the swap removal gets every case
+    for entity in (entities[0], entities[4], entities[7]):
+        world.destroy(entity)
+        check_locations(world)
+
+    for index, entity in enumerate(entities):
+        if entity in (entities[0], entities[4], entities[7]):
+            assert entity not in world
+        else:
+            assert world.get(entity, 'position') == (index, index * 2)
+            assert world.get(entity, 'layer') == (index,)
+
+
+def test_adding_and_removing_components_moves_entities():
+    world = ecs.World()
+    entities = [world.create({'position': (index, 0)}) for index in range(4)]
+
+    world.add_components(entities[1], {'velocity': (1.5, -2.0), 'gravity': ()})
+    check_locations(world)
+
+    assert world.has(entities[1], 'velocity') and world.has(entities[1], 'gravity')
+    assert world.get(entities[1], 'position') == (1, 0)
+    assert world.get(entities[1], 'velocity') == (1.5, -2.0)
+
+    # The ones left behind are still where they were
+    assert [world.get(entity, 'position') for entity in entities] == [(index, 0) for index in range(4)]
+
+    world.remove_components(entities[1], ['velocity'])
+    check_locations(world)
+
+    assert not world.has(entities[1], 'velocity')
+    assert world.has(entities[1], 'gravity')
+    assert world.get(entities[1], 'position') == (1, 0)
+
+    world.destroy(entities[1])
+    check_locations(world)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_gravity_and_movement(monkeypatch, use_numpy):
+    if use_numpy and ecs.numpy is None:
+        pytest.skip('numpy isn\'t installed')
+
+    if not use_numpy:
+        monkeypatch.setattr(ecs, 'numpy', None)
+
+    world = ecs.World()
+    falling = world.create({'position': (10, 20), 'velocity': (3.0, 14.9), 'gravity': ()})
+    floating = world.create({'position': (0, 0), 'velocity': (-2.0, 1.0)})
+
+    ecs.GravitySystem(gravity=25, max_fall=15).update(world, 0.016)
+    ecs.MovementSystem().update(world, 0.016)
+
+    assert world.get(falling, 'velocity') == (3.0, 15)
+    assert world.get(falling, 'position') == (13, 35)
+    assert world.get(floating, 'velocity') == (-2.0, 1.0)
+    assert world.get(floating, 'position') == (-2, 1)
+
+
+def test_tile_collision_matches_tile_grid_sweeps():
+    rng = random.Random(4)
+    tiles = extended.TileGrid(20, 15, 32)
+
+    for index in range(80):
+        tiles.set_solid(rng.randrange(20), rng.randrange(15))
+
+    world = ecs.World()
+    expected = {}
+
+    for index in range(200):
+        rect = pygame.Rect(rng.randrange(0, 600), rng.randrange(0, 440), rng.choice((16, 32, 40)), rng.choice((16, 32, 40)))
+        delta_x = rng.choice((0.0, rng.uniform(-40, 40)))
+        delta_y = rng.choice((0.0, rng.uniform(-40, 40)))
+
+        entity = world.create({'position': rect.topleft, 'velocity': (delta_x, delta_y), 'collider': rect.size})
+
+        # The same moves done by hand with the grid's own sweeps
+        if delta_x != 0:
+            rect.x += int(delta_x)
+            tiles.sweep_x(rect, delta_x)
+
+        if delta_y != 0:
+            rect.y += int(delta_y)
+            if tiles.sweep_y(rect, delta_y):
+                delta_y = 0
+
+        expected[entity] = (rect.topleft, delta_y)
+
+    ecs.TileCollisionSystem(tiles).update(world, 0.016)
+
+    for entity, (position, delta_y) in expected.items():
+        assert world.get(entity, 'position') == position
+        assert world.get(entity, 'velocity')[1] == delta_y
+
+
+def test_level_file_gives_same_entities_as_level():
+    object_dict = {
+        'W': [extended.Wall(None, 0, 0, 32, 32), 1],
+        'E': [extended.PhysicsObject(None, 0, 0, 32, 32), 2],
+        'A': [extended.EndBlock(None, 0, 0, 32, 32), 0]
+    }
+    file_name = ['data', 'levels', 'level_1.txt']
+
+    level_world = ecs.World()
+    ecs.add_level(level_world, extended.Level(file_name, 32, object_dict))
+
+    file_world = ecs.World()
+    ecs.add_level_file(file_world, file_name, 32, object_dict)
+
+    def get_entities(world):
+        return sorted((tuple(sorted(archetype.components)), world.get(entity, 'position'), world.get(entity, 'layer')) for entity, (archetype, row) in world.locations.items())
+
+    assert len(file_world) > 0
+    assert get_entities(file_world) == get_entities(level_world)
@@ -0,0 +1,88 @@
+import locale
+import os
+import pytest
+from gamelib import extended
+
+
+def write_level(path, text):
+    # Levels are read with the default encoding like they always have been
+    encoding = locale.getpreferredencoding(False)
+
+    try:
+        path.write_text(text, encoding=encoding)
+    except UnicodeEncodeError:
+        pytest.skip('Default encoding can\'t hold the test characters')
+
+
+def test_characters_outside_latin1_are_left_empty(tmp_path):
+    source_file = tmp_path / 'level.txt'
+    write_level(source_file, '\ufeffW\u20acW\nA  E\n')
+
+    level_file = extended.load_level_file([str(tmp_path), 'level.txt'])
+
+    assert (level_file.columns, level_file.rows) == (4, 2)
+    assert sorted(level_file.positions.keys()) == ['A', 'E', 'W']
+    assert list(level_file.positions['W']) == [1, 3]
+    assert list(level_file.positions['A']) == [4]
+    assert list(level_file.positions['E']) == [7]
+
+
+def get_expected(text):
+    # The grid and tile positions the text should compile to
+    rows = [row.rstrip() for row in text.splitlines() if row.rstrip()]
+    columns = max(len(row) for row in rows)
+    grid = ''.join(row.ljust(columns) for row in rows)
+
+    positions = {}
+    for index, character in enumerate(grid):
+        if character != ' ':
+            positions.setdefault(character, []).append(index)
+
+    return columns, len(rows), grid.encode('latin-1'), positions
+
+
+def check_level_file(level_file, text):
+    columns, rows, grid, positions = get_expected(text)
+
+    assert (level_file.columns, level_file.rows) == (columns, rows)
+    assert level_file.grid.tobytes() == grid
+    assert {character: list(indices) for character, indices in level_file.positions.items()} == positions
+
+
+def test_compiled_level_round_trip(tmp_path):
+    source_file = tmp_path / 'level.txt'
+    compiled_file = tmp_path / 'level.lvl'
+    file_name = [str(tmp_path), 'level.txt']
+
+    text = 'W    W\nW E  \n\nWWAWWW   \n'
+    source_file.write_text(text)
+
+    level_file = extended.load_level_file(file_name)
+    check_level_file(level_file, text)
+
+    # Written next to the text and read back the same
+    assert compiled_file.exists()
+    check_level_file(extended.CompiledLevel(compiled_file.read_bytes()), text)
+
+    # Loading again doesn't compile again
+    compiled_time = compiled_file.stat().st_mtime_ns
+    assert extended.load_level_file(file_name) is level_file
+    assert compiled_file.stat().st_mtime_ns == compiled_time
+
+    # Editing the text makes it stale
+    text = 'W    W\nW EE W\nWWWWAW\n'
+    source_file.write_text(text)
+
+    level_file = extended.load_level_file(file_name)
+    check_level_file(level_file, text)
+    check_level_file(extended.CompiledLevel(compiled_file.read_bytes()), text)
+
+    # So does the same size edit with only the time to tell it apart
+    text = 'W    W\nW E  W\nWWWWAW\n'
+    source_file.write_text(text)
+    source_stat = source_file.stat()
+    os.utime(source_file, ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns + 10 ** 9))
+
+    level_file = extended.load_level_file(file_name)
+    check_level_file(level_file, text)
+    assert not level_file.is_stale(str(source_file))
@@ -0,0 +1,141 @@
+import pygame
+import pytest
+import scenes
+from gamelib import extended
+
+
+class FakeDirector:
+    delta_time = 0.016
+
+
+class FakeScene:
+    # Just enough scene for physics objects to chase a player
+    def __init__(self):
+        self.director = FakeDirector()
+        self.player = extended.Collider(pygame.Rect(1000, 0, 32, 32))
+
+    def object_moved(self, level_object):
+        pass
+
+
+class NeverResting(extended.PhysicsObject):
+    # What every enemy did before resting existed
+    __slots__ = ()
+
+    def on_update(self, collision_objects):
+        super().on_update(collision_objects)
+        self.sim_state = 0
+
+
+def make_tiles():
+    # A ledge on the left with a lower floor under the whole level
+    tiles = extended.TileGrid(20, 16, 32)
+
+    for column in range(6):
+        tiles.set_solid(column, 10)
+
+    for column in range(20):
+        tiles.set_solid(column, 14)
+
+    return tiles
+
+
+def run_enemy(physics_class, wait_frames, batched=False):
+    # Stands around with the player far away, then chases them off the ledge
+    scene = FakeScene()
+    tiles = make_tiles()
+    enemy = physics_class(scene, 64, 288, 32, 32)
+
+    batch = extended.PhysicsBatch(scene, [enemy]) if batched else None
+
+    trajectory = []
+    rested = False
+
+    for frame in range(wait_frames + 90):
+        if frame == wait_frames:
+            scene.player.rect.x = 400
+
+        if batch is not None:
+            batch.on_update(tiles)
+            rested = rested or batch.sim_state[0] == 1
+        else:
+            enemy.on_update(tiles)
+            rested = rested or enemy.sim_state == 1
+
+        trajectory.append(tuple(enemy.rect.topleft))
+
+    return trajectory, rested
+
+
+@pytest.mark.parametrize('wait_frames', range(20, 26))
+def test_resting_enemy_walks_off_ledge_like_an_active_one(wait_frames):
+    expected, never_rested = run_enemy(NeverResting, wait_frames)
+    trajectory, rested = run_enemy(extended.PhysicsObject, wait_frames)
+
+    assert rested
+    assert expected[-1][1] > 288
+    assert trajectory == expected
+
+
+@pytest.mark.skipif(extended.numpy is None, reason='PhysicsBatch needs numpy')
+@pytest.mark.parametrize('wait_frames', range(20, 26))
+def test_resting_batch_walks_off_ledge_like_an_active_object(wait_frames):
+    expected, never_rested = run_enemy(NeverResting, wait_frames)
+    trajectory, rested = run_enemy(extended.PhysicsObject, wait_frames, batched=True)
+
+    assert rested
+    assert trajectory == expected
+
+
+def start_first_level(director, frames):
+    director.add_scenes([('FirstLevel', scenes.FirstLevel)])
+    director.load_scene('FirstLevel')
+
+    for frame in range(frames):
+        director.run_frame()
+
+    return director.active_scene
+
+
+def get_batch_velocities(batch):
+    return {physics_object: (float(batch.delta_x[index]), float(batch.delta_y[index])) for physics_object, index in batch.indices.items()}
+
+
+@pytest.mark.skipif(extended.numpy is None, reason='PhysicsBatch needs numpy')
+def test_off_grid_wall_hands_batch_back_to_objects(director):
+    scene = start_first_level(director, 30)
+    enemies = list(scene.level[2])
+
+    # Not lined up with the tiles so the level can't keep its tile grid
+    scene.add_object(1, extended.Wall(scene, 100, 110, 40, 20))
+
+    for frame in range(30):
+        director.run_frame()
+
+    assert scene.level.tiles is None
+    assert scene.physics_batch is None
+    assert all(enemy in scene.update_objects for enemy in enemies)
+
+    level_rect = pygame.Rect(0, 0, scene.level.level_width, scene.level.level_height)
+    assert all(level_rect.contains(enemy.rect) for enemy in enemies)
+
+
+@pytest.mark.skipif(extended.numpy is None, reason='PhysicsBatch needs numpy')
+def test_dissolving_batch_keeps_velocities(director):
+    scene = start_first_level(director, 30)
+    velocities = get_batch_velocities(scene.physics_batch)
+
+    scene.dissolve_physics_batch()
+
+    assert {enemy: (enemy.delta_x, enemy.delta_y) for enemy in velocities} == velocities
+
+
+@pytest.mark.skipif(extended.numpy is None, reason='PhysicsBatch needs numpy')
+def test_snapshot_gets_velocities_from_batch(director):
+    scene = start_first_level(director, 30)
+    velocities = get_batch_velocities(scene.physics_batch)
+
+    scene.take_snapshot()
+
+    states = {level_object: (state['delta_x'], state['delta_y']) for layer_number, level_object, state in scene.snapshot_objects if level_object in velocities}
+    assert states == velocities
@@ -0,0 +1,126 @@
+import pygame
+from gamelib import base, extended
+
+COLUMNS = 240
+ROWS = 12
+
+
+def write_wide_level(path):
+    # A long floor with an enemy every 8 tiles and a wall every 20
+    # Walls down both sides like the real levels, empty lines get skipped
+    rows = [['W'] + [' '] * (COLUMNS - 2) + ['W'] for row in range(ROWS)]
+
+    for column in range(COLUMNS):
+        rows[ROWS - 1][column] = 'W'
+
+    for column in range(12, COLUMNS - 4, 8):
+        rows[ROWS - 2][column] = 'E'
+
+    for column in range(10, COLUMNS, 20):
+        rows[ROWS - 3][column] = 'L'
+
+    path.write_text('\n'.join(''.join(row) for row in rows) + '\n')
+
+
+class WideScene(extended.AdvancedPlatformScene):
+    # Streams the generated level in small chunks
+    def __init__(self, director=None, level_file=None):
+        animation = extended.Animation([(base.ColorSurface((32, 32), base.Colors.RED), 0.2)])
+
+        level_config = {
+            'file': level_file,
+            'object_dict': {
+                'W': [extended.Wall(self, 0, 0, 32, 32), 1],
+                'L': [extended.Wall(self, 0, 0, 32, 32), 1],
+                'E': [extended.PhysicsObject(self, 0, 0, 32, 32), 2]
+            },
+            'width_constant': 32,
+            'static_layers': [1],
+            'collision': 'tiles',
+            'batch_layer': 2,
+            'background': ['assets', 'images', 'clouds.pcx'],
+            'name': 'Wide',
+            'music': extended.BackgroundMusic(['assets', 'sounds', 'background.wav']),
+            'player': [extended.Player(self, 64, (ROWS - 2) * 32, 32, 32, 400, animation), 3],
+            'streaming': True,
+            'chunk_size': 256,
+            'activation_radius': 200,
+            'stream_radius': 400
+        }
+
+        super().__init__(director, level_config)
+
+
+def make_scene(director, tmp_path):
+    write_wide_level(tmp_path / 'wide.txt')
+
+    director.add_scenes([('Wide', lambda director: WideScene(director, [str(tmp_path), 'wide.txt']))])
+    director.load_scene('Wide')
+
+    return director.active_scene
+
+
+def describe(scene):
+    # Everything loaded, by the tile it came from and where it is now
+    return sorted((layer_number, scene.level.spawn_indices.get(level_object), tuple(level_object.rect)) for layer_number, level_layer in scene.level.layers.items() for level_object in level_layer)
+
+
+def walk_to(director, scene, x, loaded_counts):
+    # Teleport along a tile at a time, standing on the floor
+    step = 32 if x > scene.player.rect.x else -32
+
+    for player_x in range(scene.player.rect.x, x, step):
+        scene.player.rect.topleft = (player_x, (ROWS - 2) * 32)
+        director.run_frame()
+
+        loaded_counts.append(sum(len(level_layer) for level_layer in scene.level.layers.values()))
+
+
+def test_walking_a_wide_level(director, tmp_path):
+    scene = make_scene(director, tmp_path)
+    level = scene.level
+
+    initial = describe(scene)
+    initial_chunks = set(level.loaded_chunks)
+
+    # Kill the first enemy and knock out the first wall, both near the start
+    enemy = min(level[2], key=lambda level_object: level_object.rect.x)
+    wall = [level_object for level_object in level[1] if level_object.rect.y == (ROWS - 3) * 32][0]
+    enemy_index = level.spawn_indices[enemy]
+    wall_index = level.spawn_indices[wall]
+    wall_tile = (wall.rect.x // 32, wall.rect.y // 32)
+    enemy_count = sum(1 for row in open(tmp_path / 'wide.txt') for character in row if character == 'E')
+
+    scene.queue_removal(2, enemy)
+    scene.remove_object(1, wall)
+    director.run_frame()
+
+    # There and back again, so the start gets unloaded and loaded
+    loaded_counts = []
+    walk_to(director, scene, COLUMNS * 32 - 64, loaded_counts)
+
+    assert (0, 0) not in level.loaded_chunks
+    walk_to(director, scene, 64, loaded_counts)
+    assert (0, 0) in level.loaded_chunks
+
+    # Only ever the chunks near the player
+    total_objects = COLUMNS + ROWS * 2 + enemy_count + COLUMNS // 20
+    assert max(loaded_counts) < total_objects / 4
+
+    # What was killed or knocked out doesn't come back
+    spawned = {level.spawn_indices.get(level_object) for level_layer in level.layers.values() for level_object in level_layer}
+    assert enemy_index not in spawned
+    assert wall_index not in spawned
+    assert not level.tiles.is_solid(*wall_tile)
+
+    # Every other enemy is either loaded or saved with its chunk
+    saved_enemies = sum(1 for saved in level.saved_objects.values() for layer_number, index, saved_object, state in saved if layer_number == 2)
+    unspawned_enemies = sum(1 for index in level.level_file.positions['E'] if index not in level.used_tiles)
+    assert len(level[2]) + saved_enemies + unspawned_enemies == enemy_count - 1
+
+    # Leaving puts it all back how it started
+    scene.on_exit()
+
+    assert describe(scene) == initial
+    assert level.loaded_chunks == initial_chunks
+    assert level.tiles.is_solid(*wall_tile)
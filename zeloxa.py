@@ -12,21 +12,21 @@ def main():
     args = parser.parse_args()
 
     # Initialise director
-    director = gamelib.base.Director('Zeloxa')
+    director = gamelib.base.Director('Zeloxa', dirty_rects=True, unload_idle_after=60000, loading_scene='Loading')
 
     # The director scene model was inspired by another blog post
 
-    # Initialise scenes
-    splash_screen = zeloxa.SplashScreen(director)
-    main_menu = zeloxa.MainMenu(director)
-    help_screen = zeloxa.HelpScene(director)
-    level_select = zeloxa.LevelSelect(director)
-    level_1 = zeloxa.FirstLevel(director)
-    level_2 = zeloxa.SecondLevel(director)
-    level_3 = zeloxa.ThirdLevel(director)
-
-    # Collect into list
-    game_scenes = [splash_screen, main_menu, help_screen, level_select, level_1, level_2, level_3]
+    # Scenes get built the first time they're loaded
+    game_scenes = [
+        ('Splash', zeloxa.SplashScreen),
+        ('MainMenu', zeloxa.MainMenu),
+        ('HelpScene', zeloxa.HelpScene),
+        ('LevelSelect', zeloxa.LevelSelect),
+        ('Loading', zeloxa.LoadingScene),
+        ('FirstLevel', zeloxa.FirstLevel),
+        ('SecondLevel', zeloxa.SecondLevel),
+        ('ThirdLevel', zeloxa.ThirdLevel)
+    ]
 
     # Add levels to director
     director.add_scenes(game_scenes)